@@ -0,0 +1,122 @@
+class AnimationClock:
+   """Works out each animated entity's frame from the time its animation
+   started, so animations need no scheduled actions and cost nothing
+   until the entity is drawn."""
+   def __init__(self):
+      self.animations = {}
+      self.frames_shown = 0
+      self.frames_skipped = 0
+
+
+   def start(self, entity, ticks, repeat_count=0):
+      """Advance entity one frame every animation rate from ticks on,
+      stopping after repeat_count frames unless repeat_count is 0."""
+      self.resume(entity, ticks, entity.current_img, repeat_count)
+
+
+   def resume(self, entity, start, base, repeat_count, shown=0):
+      """Restore an animation started at start from frame base."""
+      animation = Animation(start, entity.get_animation_rate(), base,
+         repeat_count)
+      animation.shown = shown
+      self.animations[entity] = animation
+
+
+   def get(self, entity):
+      return self.animations.get(entity)
+
+
+   def stop(self, entity, ticks):
+      animation = self.animations.pop(entity, None)
+      if animation is not None:
+         self.frames_skipped += animation.steps(ticks) - animation.shown
+
+
+   def __len__(self):
+      return len(self.animations)
+
+
+   def __contains__(self, entity):
+      return entity in self.animations
+
+
+   def frame(self, entity, ticks):
+      animation = self.animations.get(entity)
+      if animation is None:
+         return entity.current_img
+      return animation.frame(ticks, len(entity.get_images()))
+
+
+   def sync(self, entities, ticks):
+      """Bring the current image of each entity up to ticks, returning the
+      positions of those whose image changed."""
+      tiles = []
+      for entity in entities:
+         animation = self.animations.get(entity)
+         if animation is not None:
+            steps = animation.steps(ticks)
+            if steps != animation.shown:
+               self.frames_shown += 1
+               self.frames_skipped += steps - animation.shown - 1
+               animation.shown = steps
+            frame = animation.frame(ticks, len(entity.get_images()))
+            if frame != entity.current_img:
+               entity.current_img = frame
+               tiles.append(entity.get_position())
+      return tiles
+
+
+   def next_frame_time(self, entities, ticks):
+      """The earliest time after ticks at which one of entities moves to
+      another frame, or None if none of them will."""
+      times = [animation.next_step_time(ticks)
+         for animation in map(self.animations.get, entities)
+         if animation is not None]
+      times = [time for time in times if time is not None]
+      return min(times) if times else None
+
+
+   def stats(self, ticks):
+      """Frame steps applied to entities that were drawn, against the
+      steps that passed unseen and would each have been a scheduled
+      animation action."""
+      pending = sum(animation.steps(ticks) - animation.shown
+         for animation in self.animations.values())
+      return {'animated': len(self.animations),
+         'frames_shown': self.frames_shown,
+         'frames_avoided': self.frames_skipped + pending}
+
+
+def format_stats(stats):
+   return ('%d animated entities: %d frames drawn, %d off-screen frames '
+      'skipped' % (stats['animated'], stats['frames_shown'],
+      stats['frames_avoided']))
+
+
+class Animation:
+   __slots__ = ('start', 'rate', 'base', 'repeat_count', 'shown')
+
+   def __init__(self, start, rate, base, repeat_count):
+      self.start = start
+      self.rate = rate
+      self.base = base
+      self.repeat_count = repeat_count
+      self.shown = 0
+
+
+   def steps(self, ticks):
+      steps = max(ticks - self.start, 0) // self.rate
+      if self.repeat_count:
+         steps = min(steps, self.repeat_count)
+      return steps
+
+
+   def next_step_time(self, ticks):
+      steps = self.steps(ticks)
+      if self.repeat_count and steps >= self.repeat_count:
+         return None
+      return self.start + (steps + 1) * self.rate
+
+
+   def frame(self, ticks, count):
+      return (self.base + self.steps(ticks)) % count
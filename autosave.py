@@ -0,0 +1,120 @@
+import os
+import queue
+import save_load
+import threading
+import time
+
+
+class WorldCopy:
+   """The parts of a world that the text formats write, as they were when
+   the copy was made.  Only the records are copied up front.  Background
+   rows are read from the world by the worker thread, except for rows the
+   world hands over through keep_row just before changing them."""
+   def __init__(self, world, records):
+      self.world = world
+      self.num_rows = world.num_rows
+      self.num_cols = world.num_cols
+      self.records = records
+      self.kept = {}
+      self.done = False
+      self.lock = threading.Lock()
+
+
+   def keep_row(self, row):
+      with self.lock:
+         if not self.done and row not in self.kept:
+            self.kept[row] = self.world.get_background_row(row)
+
+
+   def get_background_row(self, row):
+      with self.lock:
+         kept = self.kept.get(row)
+         if kept is None:
+            kept = self.world.get_background_row(row)
+      return kept
+
+
+   def finish(self):
+      with self.lock:
+         self.done = True
+         self.kept = {}
+
+
+def write_copy(copy, filename):
+   """Write copy next to filename and move it into place, so that readers
+   never see a partly written file."""
+   temp_filename = filename + '.tmp'
+   try:
+      with open(temp_filename, 'w') as file:
+         for record in copy.records:
+            file.write(record + '\n')
+         save_load.save_background(copy, file)
+         file.flush()
+         os.fsync(file.fileno())
+   finally:
+      copy.finish()
+   os.replace(temp_filename, filename)
+
+
+class Autosaver:
+   """Saves worlds on a worker thread.  Only the records are gathered on
+   the calling thread; the time it takes is kept in pauses."""
+   def __init__(self):
+      self.requests = queue.Queue()
+      self.worker = None
+      self.pauses = []
+      self.saves = 0
+      self.errors = []
+
+
+   def save(self, world, filename, records=save_load.entity_records):
+      """Queue world to be written to filename.  records gives the lines
+      written before the background, save_load.entity_records for a world
+      file or snapshot.records for a snapshot."""
+      start = time.time()
+      copy = WorldCopy(world, records(world))
+      world.background_copies = [other for other in world.background_copies
+         if not other.done] + [copy]
+      self.pauses.append(time.time() - start)
+
+      if self.worker is None:
+         self.worker = threading.Thread(target=self.run, daemon=True)
+         self.worker.start()
+      self.requests.put((copy, filename))
+
+
+   def run(self):
+      while True:
+         (copy, filename) = self.requests.get()
+         try:
+            if copy is None:
+               return
+            write_copy(copy, filename)
+            self.saves += 1
+         # anything escaping here would leave later saves queued with no
+         # one to write them, and flush waiting forever
+         except Exception as e:
+            self.errors.append(e)
+         finally:
+            self.requests.task_done()
+
+
+   def flush(self):
+      """Wait until every queued save has been written."""
+      self.requests.join()
+
+
+   def close(self):
+      if self.worker is not None:
+         self.requests.put((None, None))
+         self.worker.join()
+         self.worker = None
+
+
+def format_stats(saver):
+   if not saver.pauses:
+      return 'no saves'
+   return ('%d saves, main thread paused %.2f ms on average, %.2f ms at '
+      'most, %d failed' % (len(saver.pauses),
+      sum(saver.pauses) * 1000 / len(saver.pauses), max(saver.pauses) * 1000,
+      len(saver.errors)))
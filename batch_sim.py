@@ -0,0 +1,304 @@
+import distance_field
+import entities
+import heapq
+import point
+
+try:
+   import numpy
+except ImportError:
+   numpy = None
+
+BATCH_CAPACITY = 1024
+
+# below this many actors due in a tick, planning costs more than it saves
+PLAN_MIN = 16
+
+NOT_FULL = 0
+FULL = 1
+BLOB = 2
+
+KIND_TARGETS = {NOT_FULL: entities.Ore, FULL: entities.Blacksmith,
+   BLOB: entities.Vein}
+
+
+def kind_of(entity):
+   if isinstance(entity, entities.MinerNotFull):
+      return NOT_FULL
+   elif isinstance(entity, entities.MinerFull):
+      return FULL
+   elif isinstance(entity, entities.OreBlob):
+      return BLOB
+   return None
+
+
+class BatchEngine:
+   """Runs miner and blob behaviour from array columns instead of one
+   scheduled closure per actor.  Every actor due in a tick is planned in
+   one vectorised pass over the distance fields, then run one at a time,
+   interleaved with the world's action queue by due time and sequence
+   number, so that moves resolve exactly as the scheduled actions would."""
+   def __init__(self, world, i_store, capacity=BATCH_CAPACITY):
+      if numpy is None:
+         raise ImportError('BatchEngine requires numpy')
+      if not all(target in world.fields for target in KIND_TARGETS.values()):
+         raise ValueError('BatchEngine requires the world distance fields')
+      self.world = world
+      self.i_store = i_store
+      self.size = 0
+      self.entities = []
+      self.rows = {}
+      self.x = numpy.zeros(capacity, numpy.int32)
+      self.y = numpy.zeros(capacity, numpy.int32)
+      self.rate = numpy.zeros(capacity, numpy.int64)
+      self.resource_count = numpy.zeros(capacity, numpy.int32)
+      self.next_due = numpy.zeros(capacity, numpy.int64)
+      self.seq = numpy.zeros(capacity, numpy.int64)
+      self.kind = numpy.zeros(capacity, numpy.int8)
+      self.field_arrays = {}
+      self.ticks = 0
+      self.pending = []
+      self.plans = {}
+      self.actions_run = 0
+      self.behaviours = {
+         NOT_FULL: (world.miner_to_ore, world.is_open, world.move_entity,
+            world.try_transform_miner_not_full),
+         FULL: (world.miner_to_smith, world.is_open, world.move_entity,
+            world.try_transform_miner_full),
+         BLOB: (world.blob_to_vein, world.is_open_for_blob, world.move_blob,
+            None)}
+
+
+   def columns(self):
+      return [self.x, self.y, self.rate, self.resource_count, self.next_due,
+         self.seq, self.kind]
+
+
+   def grow(self):
+      (self.x, self.y, self.rate, self.resource_count, self.next_due,
+         self.seq, self.kind) = [numpy.concatenate((column,
+         numpy.zeros_like(column))) for column in self.columns()]
+
+
+   def add(self, entity, due, seq=None):
+      if self.size == len(self.x):
+         self.grow()
+      row = self.size
+      self.entities.append(entity)
+      self.rows[entity] = row
+      self.size += 1
+      self.kind[row] = kind_of(entity)
+      self.rate[row] = entity.get_rate()
+      self.next_due[row] = due
+      self.seq[row] = self.world.action_queue.sequence(seq)
+      self.sync(row, entity)
+      self.queue(row)
+
+
+   def queue(self, row):
+      """Add row to the actors still to run this tick if it is already
+      due."""
+      if self.next_due[row] < self.ticks:
+         heapq.heappush(self.pending, (int(self.next_due[row]),
+            int(self.seq[row]), self.entities[row]))
+
+
+   def sync(self, row, entity):
+      pt = entity.get_position()
+      self.x[row] = pt.x
+      self.y[row] = pt.y
+      if isinstance(entity, entities.Miner):
+         self.resource_count[row] = entity.get_resource_count()
+
+
+   def remove(self, entity):
+      row = self.rows.pop(entity, None)
+      if row is None:
+         return
+
+      last = self.size - 1
+      if row != last:
+         for column in self.columns():
+            column[row] = column[last]
+         moved = self.entities[last]
+         self.entities[row] = moved
+         self.rows[moved] = row
+      self.entities.pop()
+      self.size -= 1
+
+
+   def __len__(self):
+      return self.size
+
+
+   def next_due_time(self):
+      if self.size:
+         return int(self.next_due[:self.size].min())
+      return None
+
+
+   def scheduled(self):
+      """(entity, due time, sequence number) for each actor, in the order
+      they will run."""
+      rows = numpy.lexsort((self.seq[:self.size], self.next_due[:self.size]))
+      return [(self.entities[row], int(self.next_due[row]),
+         int(self.seq[row])) for row in rows]
+
+
+   def field_array(self, target):
+      """NumPy copies of a field's distances and kinds, brought up to date
+      from the tiles the field reports as changed."""
+      field = self.world.fields[target]
+      if field.dirty:
+         field.rebuild()
+      arrays = self.field_arrays.get(target)
+      if arrays is None:
+         field.track_changes()
+         arrays = (numpy.zeros(len(field.dist), numpy.int64),
+            numpy.zeros(len(field.kinds), numpy.int8))
+         self.field_arrays[target] = arrays
+
+      (dist, kinds) = arrays
+      if len(field.changed) * 4 > len(field.dist):
+         dist[:] = field.dist
+         kinds[:] = field.kinds
+      elif field.changed:
+         changed = list(field.changed)
+         dist[changed] = [field.dist[idx] for idx in changed]
+         kinds[changed] = [field.kinds[idx] for idx in changed]
+      field.changed.clear()
+
+      shape = (field.height, field.width)
+      return (dist.reshape(shape), kinds.reshape(shape))
+
+
+   def is_stale(self, field, pt):
+      """Whether the field changed around pt since the tick was planned."""
+      idx = pt.y * field.width + pt.x
+      changed = field.changed
+      return (idx in changed or idx - 1 in changed or idx + 1 in changed or
+         idx - field.width in changed or idx + field.width in changed)
+
+
+   def plan(self, kind, rows):
+      """For each row, whether a target is adjacent and the neighbors
+      closer to a target than the actor, best first."""
+      (dist, kinds) = self.field_array(KIND_TARGETS[kind])
+      (height, width) = dist.shape
+      # actors loaded outside a smaller world stay where they are, as in seek
+      x = self.x[rows]
+      y = self.y[rows]
+      within = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+
+      offsets = numpy.array(distance_field.NEIGHBORS)
+      xs = x[:, None] + offsets[:, 0]
+      ys = y[:, None] + offsets[:, 1]
+      inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+      cx = numpy.clip(xs, 0, width - 1)
+      cy = numpy.clip(ys, 0, height - 1)
+
+      near = numpy.where(inside, dist[cy, cx], distance_field.UNREACHABLE)
+      adjacent = (within & (inside &
+         (kinds[cy, cx] == distance_field.SOURCE)).any(1))
+      own = numpy.where(within,
+         dist[numpy.clip(y, 0, height - 1), numpy.clip(x, 0, width - 1)], 0)
+      order = numpy.argsort(near, axis=1, kind='stable')
+      ranked = numpy.take_along_axis(near, order, 1) < own[:, None]
+
+      return (adjacent, order, ranked)
+
+
+   def start_tick(self, ticks):
+      """Plan every actor due before ticks and line them up for run_next.
+      Too few to be worth a vectorised pass are left to seek as they run."""
+      self.ticks = ticks
+      self.plans = {}
+      due = numpy.flatnonzero(self.next_due[:self.size] < ticks)
+      due = due[numpy.lexsort((self.seq[due], self.next_due[due]))]
+      # a sorted list is already a heap
+      self.pending = list(zip(self.next_due[due].tolist(),
+         self.seq[due].tolist(), [self.entities[row] for row in due]))
+      if len(due) < PLAN_MIN:
+         return
+
+      for kind in KIND_TARGETS:
+         rows = due[self.kind[due] == kind]
+         if len(rows):
+            (adjacent, order, ranked) = self.plan(kind, rows)
+            for (i, row) in enumerate(rows):
+               self.plans[self.entities[row]] = (adjacent[i], order[i],
+                  ranked[i])
+
+
+   def head(self):
+      """(due time, sequence number) of the next actor to run this tick."""
+      while self.pending:
+         (due, seq, entity) = self.pending[0]
+         # actors removed since they were lined up are skipped
+         if entity in self.rows:
+            return (due, seq)
+         heapq.heappop(self.pending)
+      return None
+
+
+   def runs_before(self, entry):
+      """Whether an actor is due this tick ahead of the queue entry, which
+      may be None."""
+      head = self.head()
+      return head is not None and (entry is None or
+         head < (entry.ord, entry.seq))
+
+
+   def run_next(self, ticks):
+      (due, seq, entity) = heapq.heappop(self.pending)
+      self.actions_run += 1
+      return self.advance(entity, int(self.kind[self.rows[entity]]),
+         self.plans.pop(entity, None), ticks)
+
+
+   def follow(self, entity, target, plan, to_target, is_open, move):
+      """What seek would do, read from the plan made at the start of the
+      tick."""
+      (adjacent, order, ranked) = plan
+      pt = entity.get_position()
+      if adjacent:
+         return to_target(entity, self.world.find_adjacent(pt, target))
+      for i in range(len(order)):
+         if not ranked[i]:
+            break
+         (dx, dy) = distance_field.NEIGHBORS[order[i]]
+         new_pt = point.Point(pt.x + dx, pt.y + dy)
+         if is_open(new_pt):
+            return (move(entity, new_pt), False)
+      return ([pt], False)
+
+
+   def advance(self, entity, kind, plan, ticks):
+      world = self.world
+      target = KIND_TARGETS[kind]
+      (to_target, is_open, move, transform) = self.behaviours[kind]
+
+      # an earlier action this tick may have changed what the plan was read
+      # from, and actors running twice in a tick were only planned once
+      if plan is None or self.is_stale(world.fields[target],
+         entity.get_position()):
+         (tiles, found) = world.seek(entity, target, to_target, is_open, move)
+      else:
+         (tiles, found) = self.follow(entity, target, plan, to_target,
+            is_open, move)
+
+      next_time = ticks + entity.get_rate()
+      if found and kind == BLOB:
+         world.add_entity(world.create_quake(tiles[0], ticks, self.i_store))
+         next_time = ticks + entity.get_rate() * 2
+      elif found:
+         new_entity = world.try_transform_miner(entity, transform)
+         if new_entity != entity:
+            self.add(new_entity, ticks + new_entity.get_rate())
+            return tiles
+
+      row = self.rows[entity]
+      self.next_due[row] = next_time
+      self.seq[row] = world.action_queue.sequence()
+      self.sync(row, entity)
+      self.queue(row)
+      return tiles
@@ -0,0 +1,394 @@
+import entities
+import autosave
+import chunked_grid
+import gc
+import io
+import image_store
+import occ_grid
+import os
+import point
+import random
+import save_load
+import save_load_binary
+import sys
+import tempfile
+import time
+import tracemalloc
+import worldmodel
+
+MEMORY_ENTITIES = 100000
+MEMORY_ROWS = 400
+MEMORY_COLS = 400
+MEMORY_TICKS = 20
+TICK_LENGTH = 100
+
+BATCH_ENTITIES = 60000
+BATCH_ROWS = 300
+BATCH_COLS = 300
+BATCH_TICKS = 30
+
+BLIT_IMAGE_LIST = 'imagelist'
+BLIT_SCREEN_SIZE = (640, 480)
+BLIT_COUNT = 50000
+
+SAVE_WORLD_FILE = 'gaia.sav'
+SAVE_WORLD_COLS = 40
+SAVE_WORLD_ROWS = 30
+SAVE_REPEAT = 25
+
+GRID_ENTITIES = 20000
+GRID_ROWS = 300
+GRID_COLS = 300
+GRID_REPEAT = 5
+
+MINER_SHARE = 0.1
+ORE_SHARE = 0.05
+VEIN_SHARE = 0.01
+SMITH_SHARE = 0.01
+
+IMAGE_COUNTS = {'miner': 5, 'blob': 12, 'quake': 6, 'ore': 1, 'vein': 1,
+   'blacksmith': 1, 'obstacle': 1, 'grass': 1,
+   image_store.DEFAULT_IMAGE_NAME: 1}
+
+
+def placeholder_images():
+   return dict((key, [None] * count) for (key, count) in IMAGE_COUNTS.items())
+
+
+def create_world(num_rows, num_cols, i_store, grid=occ_grid.Grid):
+   background = entities.Background('grass',
+      image_store.get_images(i_store, 'grass'))
+   return worldmodel.WorldModel(num_rows, num_cols, background, grid)
+
+
+def create_entity(kind, name, pt, i_store):
+   if kind < MINER_SHARE:
+      return entities.MinerNotFull(name, 2, pt, random.randint(600, 1000),
+         image_store.get_images(i_store, 'miner'), 100)
+   kind -= MINER_SHARE
+   if kind < ORE_SHARE:
+      return entities.Ore(name, pt, image_store.get_images(i_store, 'ore'),
+         random.randint(20000, 30000))
+   kind -= ORE_SHARE
+   if kind < VEIN_SHARE:
+      return entities.Vein(name, random.randint(8000, 17000), pt,
+         image_store.get_images(i_store, 'vein'))
+   kind -= VEIN_SHARE
+   if kind < SMITH_SHARE:
+      return entities.Blacksmith(name, pt,
+         image_store.get_images(i_store, 'blacksmith'), 10, 3000)
+   return entities.Obstacle(name, pt,
+      image_store.get_images(i_store, 'obstacle'))
+
+
+def populate(world, count, i_store):
+   cells = [(x, y) for y in range(world.num_rows)
+      for x in range(world.num_cols)]
+   random.shuffle(cells)
+   created = []
+   for (x, y) in cells[:count]:
+      entity = create_entity(random.random(), 'e_%d_%d' % (x, y),
+         point.Point(x, y), i_store)
+      world.add_entity(entity)
+      created.append(entity)
+   return created
+
+
+def schedule(world, created, i_store):
+   for entity in created:
+      if isinstance(entity, entities.MinerNotFull):
+         world.schedule_miner(entity, 0, i_store)
+      elif isinstance(entity, entities.Vein):
+         world.schedule_vein(entity, 0, i_store)
+      elif isinstance(entity, entities.Ore):
+         world.schedule_ore(entity, 0, i_store)
+
+
+def bench_memory():
+   """Bytes retained per entity and transient allocation per tick."""
+   random.seed(0)
+   i_store = placeholder_images()
+   world = create_world(MEMORY_ROWS, MEMORY_COLS, i_store)
+
+   gc.collect()
+   tracemalloc.start()
+   before = tracemalloc.get_traced_memory()[0]
+   created = populate(world, MEMORY_ENTITIES, i_store)
+   gc.collect()
+   after = tracemalloc.get_traced_memory()[0]
+   print('entities: %d, bytes per entity (world included): %.1f' %
+      (len(created), (after - before) / float(len(created))))
+
+   schedule(world, created, i_store)
+   # one warm-up tick builds the lazily computed distance fields
+   world.update_on_time(TICK_LENGTH)
+
+   peaks = []
+   events = 0
+   start = time.time()
+   for tick in range(2, MEMORY_TICKS + 2):
+      base = tracemalloc.get_traced_memory()[0]
+      tracemalloc.reset_peak()
+      events += len(world.update_on_time(tick * TICK_LENGTH))
+      peaks.append(tracemalloc.get_traced_memory()[1] - base)
+   elapsed = time.time() - start
+   tracemalloc.stop()
+
+   print('ticks: %d, tiles touched: %d, %.3f s' %
+      (MEMORY_TICKS, events, elapsed))
+   print('transient bytes per tick: mean %.0f, max %d' %
+      (sum(peaks) / float(len(peaks)), max(peaks)))
+
+
+def run_ticks(batch):
+   random.seed(0)
+   i_store = placeholder_images()
+   world = create_world(BATCH_ROWS, BATCH_COLS, i_store)
+   if batch:
+      world.enable_batch(i_store)
+   created = populate(world, BATCH_ENTITIES, i_store)
+   schedule(world, created, i_store)
+   world.update_on_time(TICK_LENGTH)
+
+   start = time.time()
+   for tick in range(2, BATCH_TICKS + 2):
+      world.update_on_time(tick * TICK_LENGTH)
+   return time.time() - start
+
+
+def bench_batch():
+   """Per tick cost of the action queue against the batch engine."""
+   miners = int(BATCH_ENTITIES * MINER_SHARE)
+   queued = run_ticks(False)
+   batched = run_ticks(True)
+   print('%d miners, %d ticks' % (miners, BATCH_TICKS))
+   print('action queue: %.1f ms per tick' % (queued * 1000 / BATCH_TICKS))
+   print('batch engine: %.1f ms per tick (%.1fx)' %
+      (batched * 1000 / BATCH_TICKS, queued / batched))
+
+
+def bench_blit():
+   """Blit throughput of the images loaded in each image_store mode."""
+   os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+   import pygame
+   pygame.display.init()
+   screen = pygame.display.set_mode(BLIT_SCREEN_SIZE)
+
+   for mode in (image_store.PLAIN_MODE, image_store.RLE_MODE,
+      image_store.ATLAS_MODE):
+      i_store = image_store.load_images(BLIT_IMAGE_LIST, 32, 32, mode)
+      imgs = [img for key in sorted(i_store) for img in i_store[key]]
+      positions = [(random.randrange(BLIT_SCREEN_SIZE[0] - 32),
+         random.randrange(BLIT_SCREEN_SIZE[1] - 32))
+         for i in range(BLIT_COUNT)]
+
+      start = time.time()
+      for (i, pos) in enumerate(positions):
+         screen.blit(imgs[i % len(imgs)], pos)
+      elapsed = time.time() - start
+      print('%-6s %8.0f blits/s' % (mode, BLIT_COUNT / elapsed))
+
+
+def bench_grid():
+   """Region queries over the whole map and over a view sized window on
+   each occupancy grid."""
+   i_store = placeholder_images()
+   regions = (('map', (0, 0, GRID_COLS, GRID_ROWS)),
+      ('view', (GRID_COLS // 2, GRID_ROWS // 2, 20, 15)))
+   print('%d entities on %dx%d tiles, ms per query' % (GRID_ENTITIES,
+      GRID_COLS, GRID_ROWS))
+   for (name, grid) in (('list', occ_grid.Grid),
+      ('array', occ_grid.ArrayGrid), ('chunked', chunked_grid.ChunkedGrid)):
+      random.seed(0)
+      world = create_world(GRID_ROWS, GRID_COLS, i_store, grid)
+      populate(world, GRID_ENTITIES, i_store)
+      times = []
+      for (region, rect) in regions:
+         for query in (world.occupancy.occupied_mask,
+            world.occupancy.count_by_type, world.occupancy.free_cells):
+            start = time.time()
+            for i in range(GRID_REPEAT):
+               query(*rect)
+            times.append((time.time() - start) * 1000 / GRID_REPEAT)
+      print('%-7s map: mask %7.2f, counts %7.2f, free %7.2f; '
+         'view: mask %5.3f, counts %5.3f, free %5.3f' % ((name,) +
+         tuple(times)))
+
+
+def write_repeated_world(filename, repeat, file):
+   """A text world made of repeat x repeat copies of filename, with the
+   entities renamed apart."""
+   with open(filename) as source:
+      lines = [line.split() for line in source if line.split()]
+
+   for ty in range(repeat):
+      for tx in range(repeat):
+         for properties in lines:
+            properties = list(properties)
+            properties[2] = str(int(properties[2]) + tx * SAVE_WORLD_COLS)
+            properties[3] = str(int(properties[3]) + ty * SAVE_WORLD_ROWS)
+            if properties[0] != save_load.BGND_KEY:
+               properties[1] = '%s_%d_%d' % (properties[1], tx, ty)
+            file.write(' '.join(properties) + '\n')
+
+
+def timed(function, *args):
+   start = time.time()
+   function(*args)
+   return time.time() - start
+
+
+def bench_save_load():
+   """Load and save times of a large world in the text and binary formats;
+   tiles is the old one line per tile text file, runs the current one."""
+   i_store = placeholder_images()
+   num_rows = SAVE_WORLD_ROWS * SAVE_REPEAT
+   num_cols = SAVE_WORLD_COLS * SAVE_REPEAT
+   directory = tempfile.mkdtemp()
+   tiles_file = os.path.join(directory, 'tiles.sav')
+   text_file = os.path.join(directory, 'world.sav')
+   binary_file = os.path.join(directory, 'world.wsav')
+   with open(tiles_file, 'w') as file:
+      write_repeated_world(SAVE_WORLD_FILE, SAVE_REPEAT, file)
+   save_load_binary.text_to_binary(tiles_file, binary_file)
+
+   def load_text(world, filename):
+      with open(filename) as file:
+         save_load.load_world(world, i_store, file)
+
+   def save_text(world, filename):
+      with open(filename, 'w') as file:
+         save_load.save_world(world, file)
+
+   world = create_world(num_rows, num_cols, i_store)
+   tiles_load = timed(load_text, world, tiles_file)
+   text_save = timed(save_text, world, text_file)
+   world = create_world(num_rows, num_cols, i_store)
+   text_load = timed(load_text, world, text_file)
+   world = create_world(num_rows, num_cols, i_store)
+   binary_load = timed(save_load_binary.load_world, world, i_store,
+      binary_file)
+   binary_save = timed(save_load_binary.save_world, world, binary_file)
+
+   print('%dx%d tiles, %d entities' % (num_cols, num_rows,
+      len(world.get_entities())))
+   print('tiles  load %6.0f ms,                 %8d bytes' % (
+      tiles_load * 1000, os.path.getsize(tiles_file)))
+   for (name, load, save, filename) in (
+      ('runs', text_load, text_save, text_file),
+      ('binary', binary_load, binary_save, binary_file)):
+      print('%-6s load %6.0f ms, save %6.0f ms, %8d bytes' % (name,
+         load * 1000, save * 1000, os.path.getsize(filename)))
+   for filename in (tiles_file, text_file, binary_file):
+      os.remove(filename)
+   os.rmdir(directory)
+
+
+def bench_paging():
+   """Memory held by a large world before and after paging out everything
+   away from the view, with actors only in the first copy of the map."""
+   i_store = placeholder_images()
+   text = io.StringIO()
+   write_repeated_world(SAVE_WORLD_FILE, SAVE_REPEAT, text)
+   text.seek(0)
+   directory = tempfile.mkdtemp()
+   static_file = os.path.join(directory, 'static.sav')
+   with open(static_file, 'w') as static:
+      for line in text:
+         properties = line.split()
+         if (properties[0] in (save_load.BGND_KEY, save_load.OBSTACLE_KEY) or
+            (int(properties[2]) < SAVE_WORLD_COLS and
+            int(properties[3]) < SAVE_WORLD_ROWS)):
+            static.write(line)
+   text = None
+
+   background = entities.Background('grass',
+      image_store.get_images(i_store, 'grass'))
+   gc.collect()
+   tracemalloc.start()
+   base = tracemalloc.get_traced_memory()[0]
+   world = worldmodel.WorldModel(SAVE_WORLD_ROWS * SAVE_REPEAT,
+      SAVE_WORLD_COLS * SAVE_REPEAT, background, chunked_grid.ChunkedGrid)
+   world.enable_paging(i_store)
+   with open(static_file) as static:
+      save_load.load_world(world, i_store, static, True)
+   gc.collect()
+   loaded = tracemalloc.get_traced_memory()[0] - base
+   calls = []
+   waiting = True
+   while waiting:
+      start = time.time()
+      waiting = world.page(0, 0, 20, 15)
+      calls.append(time.time() - start)
+   gc.collect()
+   paged = tracemalloc.get_traced_memory()[0] - base
+   tracemalloc.stop()
+   steady = timed(world.page, 0, 0, 20, 15)
+   fields = sum(len(field.dist) * field.dist.itemsize +
+      len(field.kinds) * field.kinds.itemsize
+      for field in world.fields.values())
+
+   print('%dx%d tiles, %d chunks of %d tiles' % (world.num_cols,
+      world.num_rows, len(world.background.chunks) +
+      len(world.background.paged_out), chunked_grid.CHUNK_SIZE ** 2))
+   print('all in memory: %.1f MB' % (loaded / 1e6))
+   print('paged out over %d calls of %.0f ms at most: %.1f MB, %d background '
+      'and %d occupancy chunks left' % (len(calls), max(calls) * 1000,
+      paged / 1e6, len(world.background.chunks), len(world.occupancy.chunks)))
+   print('of which %d distance fields: %.1f MB' % (len(world.fields),
+      fields / 1e6))
+   print('page call with nothing to write: %.1f ms' % (steady * 1000))
+   world.close_paging()
+   os.remove(static_file)
+   os.rmdir(directory)
+
+
+def bench_autosave():
+   """Main thread pause of a background save against a blocking one."""
+   i_store = placeholder_images()
+   directory = tempfile.mkdtemp()
+   tiles_file = os.path.join(directory, 'tiles.sav')
+   text_file = os.path.join(directory, 'world.sav')
+   with open(tiles_file, 'w') as file:
+      write_repeated_world(SAVE_WORLD_FILE, SAVE_REPEAT, file)
+   world = create_world(SAVE_WORLD_ROWS * SAVE_REPEAT,
+      SAVE_WORLD_COLS * SAVE_REPEAT, i_store)
+   with open(tiles_file) as file:
+      save_load.load_world(world, i_store, file)
+
+   def save_text():
+      with open(text_file, 'w') as file:
+         save_load.save_world(world, file)
+
+   blocking = timed(save_text)
+   saver = autosave.Autosaver()
+   start = time.time()
+   saver.save(world, text_file)
+   saver.flush()
+   total = time.time() - start
+   saver.close()
+
+   print('%dx%d tiles, %d entities' % (world.num_cols, world.num_rows,
+      len(world.get_entities())))
+   print('blocking save %.0f ms' % (blocking * 1000))
+   print('background save: main thread paused %.1f ms, written after %.0f ms'
+      % (saver.pauses[0] * 1000, total * 1000))
+   for filename in (tiles_file, text_file):
+      os.remove(filename)
+   os.rmdir(directory)
+
+
+BENCHMARKS = {'memory': bench_memory, 'batch': bench_batch,
+   'blit': bench_blit, 'grid': bench_grid, 'save_load': bench_save_load,
+   'autosave': bench_autosave, 'paging': bench_paging}
+
+
+def main():
+   names = sys.argv[1:] or sorted(BENCHMARKS)
+   for name in names:
+      print('== ' + name)
+      BENCHMARKS[name]()
+
+
+if __name__ == '__main__':
+   main()
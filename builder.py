@@ -1,4 +1,5 @@
 import builder_controller
+import dirty_region
 import entities
 import image_store
 import pygame
@@ -27,8 +28,10 @@ def main():
    random.seed()
    pygame.init()
    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+   load_stats = {}
    i_store = image_store.load_images(IMAGE_LIST_FILE_NAME,
-      TILE_WIDTH, TILE_HEIGHT)
+      TILE_WIDTH, TILE_HEIGHT, stats=load_stats)
+   print(image_store.format_stats(load_stats))
 
    num_cols = SCREEN_WIDTH // TILE_WIDTH * WORLD_WIDTH_SCALE
    num_rows = SCREEN_HEIGHT // TILE_HEIGHT * WORLD_HEIGHT_SCALE
@@ -43,6 +46,8 @@ def main():
    view.update_view()
 
    builder_controller.activity_loop(view, world, i_store)
+   print(worldview.format_stats(view))
+   print(dirty_region.format_stats(view.dirty))
 
 
 if __name__ == '__main__':
@@ -1,3 +1,4 @@
+import autosave
 import entities
 import image_store
 import keys
@@ -15,6 +16,8 @@ BACKGROUND_TAGS = ['grass', 'rocks']
 
 TIMER_FREQUENCY = 100
 
+AUTOSAVER = autosave.Autosaver()
+
 MINER_LIMIT = 2
 MINER_RATE_MIN = 600
 MINER_RATE_MAX = 1000
@@ -34,11 +37,11 @@ def mouse_to_tile(pos, tile_width, tile_height):
 
 
 def save_world(world, filename):
-   with open(filename, 'w') as file:
-      save_load.save_world(world, file)
+   AUTOSAVER.save(world, filename)
 
 
 def load_world(world, i_store, filename):
+   AUTOSAVER.flush()
    with open(filename, 'r') as file:
       save_load.load_world(world, i_store, file)
 
@@ -126,16 +129,18 @@ def activity_loop(view, world, i_store):
 
    entity_select = None
    while 1:
-      for event in pygame.event.get():
-         if event.type == pygame.QUIT:
-            return
-         elif event.type == pygame.MOUSEMOTION:
-            handle_mouse_motion(view, event)
-         elif event.type == pygame.MOUSEBUTTONDOWN:
-            tiles = handle_mouse_button(view, world, event, entity_select,
-               i_store)
-            view.update_view_tiles(tiles)
-         elif event.type == pygame.KEYDOWN:
-            entity_select = handle_keydown(view, event, i_store, world,
-               entity_select)
+      event = pygame.event.wait()
+      if event.type == pygame.QUIT:
+         AUTOSAVER.close()
+         print(autosave.format_stats(AUTOSAVER))
+         return
+      elif event.type == pygame.MOUSEMOTION:
+         handle_mouse_motion(view, event)
+      elif event.type == pygame.MOUSEBUTTONDOWN:
+         tiles = handle_mouse_button(view, world, event, entity_select,
+            i_store)
+         view.update_view_tiles(tiles)
+      elif event.type == pygame.KEYDOWN:
+         entity_select = handle_keydown(view, event, i_store, world,
+            entity_select)
 
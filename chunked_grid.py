@@ -0,0 +1,245 @@
+import array
+import occ_grid
+import os
+import point
+import shutil
+import threading
+
+CHUNK_SIZE = 64
+
+# palette name written for empty cells
+EMPTY_NAME = '-'
+
+
+def chunks_in(left, top, right, bottom, size):
+   """Keys of the chunks overlapping the inclusive tile rectangle."""
+   return set((cx, cy) for cy in range(top // size, bottom // size + 1)
+      for cx in range(left // size, right // size + 1))
+
+
+class ChunkedGrid(occ_grid.Grid):
+   """Grid stored as square chunks, each allocated on its first write.  With
+   a pager attached, chunks can be written to disk and dropped; they are
+   read back the first time one of their cells is used."""
+   def __init__(self, width, height, occupancy_value, chunk_size=CHUNK_SIZE):
+      self.width = width
+      self.height = height
+      self.default = occupancy_value
+      self.chunk_size = chunk_size
+      self.chunks = {}
+      self.dirty = set()
+      self.paged_out = set()
+      # held while a chunk moves between chunks and paged_out, so that
+      # get_row on another thread sees it on one side or the other
+      self.lock = threading.Lock()
+      self.pager = None
+      self.page_ins = 0
+      self.page_outs = 0
+
+
+   def chunk(self, key, create=False):
+      chunk = self.chunks.get(key)
+      if chunk is None:
+         if key in self.paged_out:
+            chunk = self.page_in(key)
+         elif create:
+            size = self.chunk_size
+            chunk = [[self.default] * size for row in range(size)]
+            self.chunks[key] = chunk
+      return chunk
+
+
+   def set_cell(self, point, value):
+      size = self.chunk_size
+      key = (point.x // size, point.y // size)
+      chunk = self.chunk(key, True)
+      chunk[point.y % size][point.x % size] = value
+      self.dirty.add(key)
+
+
+   def get_cell(self, point):
+      size = self.chunk_size
+      chunk = self.chunk((point.x // size, point.y // size))
+      if chunk is None:
+         return self.default
+      return chunk[point.y % size][point.x % size]
+
+
+   def get_row(self, y):
+      """The values of row y, read from disk where a chunk is paged out but
+      without bringing it back."""
+      size = self.chunk_size
+      row = []
+      for cx in range(0, (self.width - 1) // size + 1):
+         key = (cx, y // size)
+         width = min(size, self.width - cx * size)
+         with self.lock:
+            chunk = self.chunks.get(key)
+            paged = chunk is None and key in self.paged_out
+         if chunk is not None:
+            row.extend(chunk[y % size][:width])
+         elif paged:
+            row.extend(self.pager.read_row(key, size, y % size)[:width])
+         else:
+            row.extend([self.default] * width)
+      return row
+
+
+   def fill_row(self, point, values):
+      size = self.chunk_size
+      x = point.x
+      end = point.x + len(values)
+      while x < end:
+         key = (x // size, point.y // size)
+         chunk = self.chunk(key, True)
+         count = min(size - x % size, end - x)
+         chunk[point.y % size][x % size:x % size + count] = \
+            values[x - point.x:x - point.x + count]
+         self.dirty.add(key)
+         x += count
+
+
+   def page_out(self, keep, limit=None):
+      """Drop every resident chunk that is not in keep and that the pager
+      accepts.  Chunks changed since they were last on disk are written
+      first, at most limit of them per call; returns how many changed
+      chunks were left for later."""
+      waiting = 0
+      for key in list(self.chunks):
+         if key in keep:
+            continue
+         if key in self.dirty and limit is not None and limit <= 0:
+            waiting += 1
+            continue
+         if not self.pager.can_page(self.chunks[key]):
+            continue
+         if key in self.dirty:
+            self.pager.write(key, self.chunks[key])
+            self.dirty.discard(key)
+            if limit is not None:
+               limit -= 1
+         with self.lock:
+            self.paged_out.add(key)
+            chunk = self.chunks.pop(key)
+         self.page_outs += 1
+         self.pager.paged_out(chunk)
+      return waiting
+
+
+   def page_in(self, key):
+      (chunk, orders) = self.pager.read(key, self.chunk_size)
+      with self.lock:
+         self.chunks[key] = chunk
+         self.paged_out.discard(key)
+      self.page_ins += 1
+      self.pager.paged_in(chunk, orders)
+      return chunk
+
+
+class ChunkPager:
+   """Keeps chunks in one file each under directory: a line of value names,
+   then a palette index per cell and, if order is given, order(value) for
+   each value in row-major order.  encode names a value and decode(name,
+   pt) makes it again; can_page, paged_out and paged_in let the owner
+   refuse chunks and follow values leaving and returning."""
+   def __init__(self, directory, encode, decode, can_page=None,
+      paged_out=None, paged_in=None, order=None):
+      self.directory = directory
+      self.encode = encode
+      self.decode = decode
+      self.accepts = can_page
+      self.on_page_out = paged_out
+      self.on_page_in = paged_in
+      self.order = order
+      if not os.path.isdir(directory):
+         os.makedirs(directory)
+
+
+   def path(self, key):
+      return os.path.join(self.directory, '%d_%d.chunk' % key)
+
+
+   def can_page(self, chunk):
+      return self.accepts is None or self.accepts(chunk)
+
+
+   def write(self, key, chunk):
+      palette = {EMPTY_NAME: 0}
+      codes = array.array('H')
+      orders = array.array('q')
+      for row in chunk:
+         for value in row:
+            if value is None:
+               codes.append(0)
+               continue
+            name = self.encode(value)
+            code = palette.get(name)
+            if code is None:
+               code = palette[name] = len(palette)
+            codes.append(code)
+            if self.order is not None:
+               orders.append(self.order(value))
+
+      # replaced whole, as get_row on another thread may be reading it
+      names = sorted(palette, key=palette.get)
+      with open(self.path(key) + '.tmp', 'wb') as file:
+         file.write((' '.join(names) + '\n').encode('utf-8'))
+         codes.tofile(file)
+         orders.tofile(file)
+      os.replace(self.path(key) + '.tmp', self.path(key))
+
+
+   def load(self, key, size):
+      """The palette, cell codes and orders stored for key."""
+      with open(self.path(key), 'rb') as file:
+         palette = file.readline().decode('utf-8').split()
+         codes = array.array('H')
+         codes.fromfile(file, size * size)
+         orders = array.array('q', file.read())
+      return (palette, codes, orders)
+
+
+   def names(self, key, size):
+      """(name, point, order) for each non-empty cell of a paged out chunk;
+      order is None if the pager keeps no orders."""
+      (palette, codes, orders) = self.load(key, size)
+      orders = iter(orders)
+      for (i, code) in enumerate(codes):
+         if code:
+            (dy, dx) = divmod(i, size)
+            yield (palette[code],
+               point.Point(key[0] * size + dx, key[1] * size + dy),
+               next(orders, None))
+
+
+   def read(self, key, size):
+      """The chunk stored for key, with the orders of its values."""
+      chunk = [[None] * size for row in range(size)]
+      orders = []
+      for (name, pt, order) in self.names(key, size):
+         chunk[pt.y % size][pt.x % size] = self.decode(name, pt)
+         orders.append(order)
+      return (chunk, orders)
+
+
+   def read_row(self, key, size, dy):
+      (palette, codes, orders) = self.load(key, size)
+      y = key[1] * size + dy
+      return [None if code == 0 else
+         self.decode(palette[code], point.Point(key[0] * size + dx, y))
+         for (dx, code) in enumerate(codes[dy * size:(dy + 1) * size])]
+
+
+   def paged_out(self, chunk):
+      if self.on_page_out is not None:
+         self.on_page_out(chunk)
+
+
+   def paged_in(self, chunk, orders):
+      if self.on_page_in is not None:
+         self.on_page_in(chunk, orders)
+
+
+   def close(self):
+      """Remove the directory and every chunk written to it."""
+      shutil.rmtree(self.directory, ignore_errors=True)
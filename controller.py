@@ -1,4 +1,6 @@
+import autosave
 import pygame
+import snapshot
 import worldview
 import worldmodel
 import point
@@ -6,7 +8,12 @@ import point
 KEY_DELAY = 400
 KEY_INTERVAL = 100
 
-TIMER_FREQUENCY = 100
+AUTOSAVE_FILE = 'autosave.snap'
+AUTOSAVE_INTERVAL = 60000
+
+PAGE_INTERVAL = 5000
+
+AUTOSAVER = autosave.Autosaver()
 
 def on_keydown(event):
    x_delta = 0
@@ -24,15 +31,37 @@ def mouse_to_tile(pos, tile_width, tile_height):
 
 
 def handle_timer_event(world, view):
-   rects = world.update_on_time(pygame.time.get_ticks())
+   ticks = pygame.time.get_ticks()
+   rects = world.update_on_time(ticks)
+   rects.extend(world.update_animations(ticks, view.viewport.left,
+      view.viewport.top, view.viewport.width, view.viewport.height))
    view.update_view_tiles(rects)
 
 
+def next_due_time(world, view, ticks):
+   return world.next_due_time(ticks, view.viewport.left, view.viewport.top,
+      view.viewport.width, view.viewport.height)
+
+
+def wait_for_event(timeout):
+   if timeout is None:
+      return pygame.event.wait()
+   elif timeout > 0:
+      return pygame.event.wait(timeout)
+   else:
+      return pygame.event.poll()
+
+
 def handle_mouse_motion(view, event):
    mouse_pt = mouse_to_tile(event.pos, view.tile_width, view.tile_height)
    view.mouse_move(mouse_pt)
 
 
+def page_world(world, view):
+   world.page(view.viewport.left, view.viewport.top, view.viewport.width,
+      view.viewport.height)
+
+
 def handle_keydown(view, event):
    view_delta = on_keydown(event)
    view.update_view(view_delta)
@@ -40,16 +69,33 @@ def handle_keydown(view, event):
 
 def activity_loop(view, world):
    pygame.key.set_repeat(KEY_DELAY, KEY_INTERVAL)
-   pygame.time.set_timer(pygame.USEREVENT, TIMER_FREQUENCY)
 
+   next_autosave = pygame.time.get_ticks() + AUTOSAVE_INTERVAL
+   next_page = pygame.time.get_ticks() + PAGE_INTERVAL
    while 1:
-      for event in pygame.event.get():
-         if event.type == pygame.QUIT:
-            return
-         elif event.type == pygame.USEREVENT:
-            handle_timer_event(world, view)
-         elif event.type == pygame.MOUSEMOTION:
-            handle_mouse_motion(view, event)
-         elif event.type == pygame.KEYDOWN:
-            handle_keydown(view, event)
-
+      ticks = pygame.time.get_ticks()
+      due = next_due_time(world, view, ticks)
+      # update_on_time only runs what is due strictly before its ticks
+      timeout = min(next_autosave, next_page) - ticks
+      if due is not None:
+         timeout = min(timeout, due + 1 - ticks)
+      event = wait_for_event(timeout)
+
+      if event.type == pygame.QUIT:
+         AUTOSAVER.close()
+         print(autosave.format_stats(AUTOSAVER))
+         return
+      elif event.type == pygame.MOUSEMOTION:
+         handle_mouse_motion(view, event)
+      elif event.type == pygame.KEYDOWN:
+         handle_keydown(view, event)
+
+      ticks = pygame.time.get_ticks()
+      if due is not None and ticks > due:
+         handle_timer_event(world, view)
+      if ticks >= next_autosave:
+         AUTOSAVER.save(world, AUTOSAVE_FILE, snapshot.records)
+         next_autosave = ticks + AUTOSAVE_INTERVAL
+      if ticks >= next_page:
+         page_world(world, view)
+         next_page = ticks + PAGE_INTERVAL
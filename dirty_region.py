@@ -0,0 +1,77 @@
+import pygame
+
+# above this many dirty tiles in a frame the whole screen is updated
+FULL_UPDATE_THRESHOLD = 150
+
+class DirtyRegion:
+   """Collects the view tiles redrawn in a frame and hands them to
+   pygame.display.update as a few merged rectangles."""
+   def __init__(self, tile_width, tile_height,
+      full_update_threshold=FULL_UPDATE_THRESHOLD):
+      self.tile_width = tile_width
+      self.tile_height = tile_height
+      self.full_update_threshold = full_update_threshold
+      self.tiles = set()
+      self.frames = 0
+      self.full_updates = 0
+      self.rects_submitted = 0
+
+
+   def add(self, view_tile_pt):
+      self.tiles.add((view_tile_pt.x, view_tile_pt.y))
+
+
+   def flush(self):
+      if not self.tiles:
+         return
+
+      self.frames += 1
+      if len(self.tiles) > self.full_update_threshold:
+         self.full_updates += 1
+         self.rects_submitted += 1
+         pygame.display.update()
+      else:
+         rects = self.merged_rects()
+         self.rects_submitted += len(rects)
+         pygame.display.update(rects)
+      self.tiles = set()
+
+
+   def merged_rects(self):
+      # runs of adjacent tiles in a row, then identical runs stacked in
+      # consecutive rows, as (left, top, right, bottom) in tiles
+      blocks = {}
+      for (left, top, right) in row_runs(self.tiles):
+         above = blocks.pop((left, right, top), None)
+         if above:
+            blocks[(left, right, top + 1)] = (above[0], top + 1)
+         else:
+            blocks[(left, right, top + 1)] = (top, top + 1)
+
+      return [pygame.Rect(left * self.tile_width, top * self.tile_height,
+         (right - left) * self.tile_width, (bottom - top) * self.tile_height)
+         for ((left, right, _), (top, bottom)) in blocks.items()]
+
+
+   def rects_per_frame(self):
+      if self.frames:
+         return self.rects_submitted / float(self.frames)
+      return 0.0
+
+
+def format_stats(region):
+   return ('%d frames flushed, %.1f rects per frame, %d full screen updates'
+      % (region.frames, region.rects_per_frame(), region.full_updates))
+
+
+def row_runs(tiles):
+   run = None
+   for (x, y) in sorted(tiles, key=lambda tile: (tile[1], tile[0])):
+      if run and run[1] == y and run[2] == x:
+         run = (run[0], y, x + 1)
+      else:
+         if run:
+            yield (run[0], run[1], run[2])
+         run = (x, y, x + 1)
+   if run:
+      yield (run[0], run[1], run[2])
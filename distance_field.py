@@ -0,0 +1,182 @@
+import array
+import collections
+import point
+
+UNREACHABLE = 1 << 30
+
+OPEN = 0
+SOURCE = 1
+WALL = 2
+
+NEIGHBORS = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+
+class DistanceField:
+   """Steps from each tile to the nearest tile next to a target entity,
+   shared by every actor heading for that kind of target.  Kinds and
+   distances are kept in typed arrays, five bytes a tile, so that a field
+   costs little next to the chunks of a paged world."""
+   def __init__(self, width, height, target, open_types=()):
+      self.width = width
+      self.height = height
+      self.target = target
+      self.open_types = open_types
+      self.kinds = array.array('b', [OPEN]) * (width * height)
+      self.dist = array.array('i', [UNREACHABLE]) * (width * height)
+      self.dirty = True
+      self.version = 0
+      self.changed = None
+
+
+   def track_changes(self):
+      """Start collecting, in self.changed, every tile whose kind or
+      distance changes."""
+      self.changed = set(range(len(self.kinds)))
+
+
+   def classify(self, occupant):
+      if occupant is None:
+         return OPEN
+      elif isinstance(occupant, self.target):
+         return SOURCE
+      elif isinstance(occupant, self.open_types):
+         return OPEN
+      else:
+         return WALL
+
+
+   def update(self, pt, occupant):
+      idx = pt.y * self.width + pt.x
+      kind = self.classify(occupant)
+      old_kind = self.kinds[idx]
+      if kind == old_kind:
+         return
+
+      self.kinds[idx] = kind
+      self.version += 1
+      if self.changed is not None:
+         self.changed.add(idx)
+      if self.dirty:
+         return
+
+      # new targets and newly opened tiles can only shorten distances, so
+      # they are spread from here; anything else may lengthen them
+      if kind == SOURCE:
+         self.dist[idx] = 0
+         self.relax([idx])
+      elif old_kind == WALL:
+         self.dist[idx] = min(self.closest_neighbor(idx) + 1, UNREACHABLE)
+         self.relax([idx])
+      else:
+         self.retract(idx)
+
+
+   def rebuild(self):
+      sources = [idx for (idx, kind) in enumerate(self.kinds)
+         if kind == SOURCE]
+      self.dist = array.array('i', [UNREACHABLE]) * len(self.kinds)
+      for idx in sources:
+         self.dist[idx] = 0
+      self.relax(sources)
+      self.dirty = False
+      if self.changed is not None:
+         self.changed.update(range(len(self.kinds)))
+
+
+   def retract(self, idx):
+      """Recompute the tiles whose distance was only supported through idx,
+      after idx lost its target or became a wall."""
+      dist = self.dist
+      kinds = self.kinds
+      lost = set([idx])
+      level = [idx]
+      while level:
+         next_level = []
+         for current in level:
+            d = dist[current] + 1
+            for n in self.neighbors(current):
+               if (n not in lost and kinds[n] == OPEN and dist[n] == d and
+                  not self.supported(n, lost)):
+                  lost.add(n)
+                  next_level.append(n)
+         level = next_level
+
+      for n in lost:
+         dist[n] = UNREACHABLE
+      if self.changed is not None:
+         self.changed.update(lost)
+
+      seeds = []
+      for n in lost:
+         if kinds[n] == OPEN:
+            nearest = self.closest_neighbor(n)
+            if nearest < UNREACHABLE - 1:
+               dist[n] = nearest + 1
+               seeds.append(n)
+      seeds.sort(key=dist.__getitem__)
+      self.relax(seeds)
+
+
+   def closest_neighbor(self, idx):
+      return min([UNREACHABLE] + [self.dist[n] for n in self.neighbors(idx)])
+
+
+   def supported(self, idx, lost):
+      d = self.dist[idx] - 1
+      for n in self.neighbors(idx):
+         if n not in lost and self.dist[n] == d:
+            return True
+      return False
+
+
+   def relax(self, start):
+      dist = self.dist
+      kinds = self.kinds
+      changed = self.changed
+      if changed is not None:
+         changed.update(start)
+      queue = collections.deque(start)
+      while queue:
+         idx = queue.popleft()
+         d = dist[idx] + 1
+         if d >= UNREACHABLE:
+            continue
+         for n in self.neighbors(idx):
+            if kinds[n] == OPEN and d < dist[n]:
+               dist[n] = d
+               queue.append(n)
+               if changed is not None:
+                  changed.add(n)
+
+
+   def neighbors(self, idx):
+      (y, x) = divmod(idx, self.width)
+      if x + 1 < self.width:
+         yield idx + 1
+      if x > 0:
+         yield idx - 1
+      if y + 1 < self.height:
+         yield idx + self.width
+      if y > 0:
+         yield idx - self.width
+
+
+   def distance(self, pt):
+      if self.dirty:
+         self.rebuild()
+      return self.dist[pt.y * self.width + pt.x]
+
+
+   def downhill(self, pt, is_open):
+      """The open neighbor of pt closest to a target, or None if no
+      neighbor gets any closer."""
+      best = None
+      best_dist = self.distance(pt)
+      for (dx, dy) in NEIGHBORS:
+         new_pt = point.Point(pt.x + dx, pt.y + dy)
+         if is_open(new_pt):
+            d = self.dist[new_pt.y * self.width + new_pt.x]
+            if d < best_dist:
+               best = new_pt
+               best_dist = d
+
+      return best
@@ -1,6 +1,8 @@
 import point
 
 class Entity(object):
+   __slots__ = ('name', 'imgs', 'current_img')
+
    def __init__(self, name, imgs):
       self.name = name
       self.imgs = imgs
@@ -22,6 +24,8 @@ class Entity(object):
       return 'unknown'
 
 class Non_static(Entity):
+   __slots__ = ('position',)
+
    def __init__(self, name, position, imgs):
       super(Non_static, self).__init__(name,imgs)
       self.position = position
@@ -33,27 +37,31 @@ class Non_static(Entity):
       return self.position
 
 class Actor(Non_static):
+   __slots__ = ('rate', 'pending_actions')
+
    def __init__(self, name, position, imgs, rate):
       super(Actor,self).__init__(name, position, imgs)
       self.rate = rate
-      self.pending_actions = []
+      self.pending_actions = set()
 
-   def remove_pending_action(self, action):
-      self.pending_actions.remove(action)
+   def remove_pending_action(self, handle):
+      self.pending_actions.discard(handle)
 
-   def add_pending_action(self, action):
-      self.pending_actions.append(action)
+   def add_pending_action(self, handle):
+      self.pending_actions.add(handle)
 
    def get_pending_actions(self):
       return self.pending_actions
 
    def clear_pending_actions(self):
-      self.pending_actions = []
+      self.pending_actions = set()
 
    def get_rate(self):
       return self.rate
 
 class ActorDist(Actor):
+   __slots__ = ('resource_distance',)
+
    def __init__(self, name, rate, position, imgs, resource_distance):
       super(ActorDist,self).__init__(name, position, imgs, rate)
       self.resource_distance = resource_distance
@@ -62,6 +70,8 @@ class ActorDist(Actor):
       return self.resource_distance
       
 class Miner(Actor):
+   __slots__ = ('resource_limit', 'resource_count', 'animation_rate')
+
    def __init__(self, name, resource_limit, position, rate, imgs, animation_rate):
       super(Miner,self).__init__(name, position, imgs, rate)
       self.resource_limit = resource_limit
@@ -87,11 +97,15 @@ class Miner(Actor):
 
 
 class Background(Entity):
+   __slots__ = ()
+
    def __init__(self, name, imgs):
       super(Background,self).__init__(name,imgs)
 
 
 class MinerNotFull(Miner):
+   __slots__ = ()
+
    def __init__(self, name, resource_limit, position, rate, imgs, animation_rate):
       super(MinerNotFull,self).__init__(name, resource_limit, position, rate, imgs,
       animation_rate)
@@ -103,11 +117,20 @@ class MinerNotFull(Miner):
  
 
 class MinerFull(Miner):
+   __slots__ = ()
+
    def __init__(self, name, resource_limit, position, rate, imgs, animation_rate):
       super(MinerFull,self).__init__(name, resource_limit, position, rate, imgs,
       animation_rate)
 
+   def self_string(self):
+      return ' '.join(['miner_full', self.name, str(self.position.x),
+            str(self.position.y), str(self.resource_limit),
+            str(self.rate), str(self.animation_rate)])
+
 class Vein(ActorDist):
+   __slots__ = ()
+
    def __init__(self, name, rate, position, imgs, resource_distance=1):
       super(Vein,self).__init__(name, rate, position, imgs, resource_distance)
       
@@ -117,6 +140,8 @@ class Vein(ActorDist):
          str(self.resource_distance)])
 
 class Ore(Actor):
+   __slots__ = ()
+
    def __init__(self, name, position, imgs, rate=5000):
       super(Ore,self).__init__(name, position, imgs, rate)
 
@@ -125,6 +150,8 @@ class Ore(Actor):
          str(self.position.y), str(self.rate)])
 
 class Blacksmith(ActorDist):
+   __slots__ = ('resource_limit', 'resource_count')
+
    def __init__(self, name, position, imgs, resource_limit, rate,
       resource_distance=1):
       super(Blacksmith,self).__init__(name, rate, position, imgs, resource_distance)
@@ -146,6 +173,8 @@ class Blacksmith(ActorDist):
          str(self.rate), str(self.resource_distance)])
 
 class Obstacle(Non_static):
+   __slots__ = ()
+
    def __init__(self, name, position, imgs):
       super(Obstacle,self).__init__(name,position,imgs)
       self.name = name
@@ -158,6 +187,8 @@ class Obstacle(Non_static):
          str(self.position.y)])
 
 class OreBlob(Actor):
+   __slots__ = ('animation_rate',)
+
    def __init__(self, name, position, rate, imgs, animation_rate):
       super(OreBlob,self).__init__(name, position, imgs, rate)
       self.animation_rate = animation_rate
@@ -165,23 +196,33 @@ class OreBlob(Actor):
    def get_animation_rate(self):
       return self.animation_rate
 
+   def self_string(self):
+      return ' '.join(['blob', self.name, str(self.position.x),
+         str(self.position.y), str(self.rate), str(self.animation_rate)])
+
 class Quake(Non_static):
+   __slots__ = ('animation_rate', 'pending_actions')
+
    def __init__(self, name, position, imgs, animation_rate):
       super(Quake,self).__init__(name, position, imgs)
       self.animation_rate = animation_rate
-      self.pending_actions = []
+      self.pending_actions = set()
 
    def get_animation_rate(self):
       return self.animation_rate
 
-   def remove_pending_action(self, action):
-      self.pending_actions.remove(action)
+   def remove_pending_action(self, handle):
+      self.pending_actions.discard(handle)
 
-   def add_pending_action(self, action):
-      self.pending_actions.append(action)
+   def add_pending_action(self, handle):
+      self.pending_actions.add(handle)
 
    def get_pending_actions(self):
       return self.pending_actions
 
    def clear_pending_actions(self):
-      self.pending_actions = []
+      self.pending_actions = set()
+
+   def self_string(self):
+      return ' '.join(['quake', self.name, str(self.position.x),
+         str(self.position.y), str(self.animation_rate)])
@@ -0,0 +1,77 @@
+class EntityRegistry:
+   """Entities in insertion order, with constant time removal and views by
+   type and by name."""
+   def __init__(self):
+      self.entities = {}
+      self.next_order = 0
+      self.in_order = True
+      self.by_type = {}
+      self.by_name = {}
+
+
+   def add(self, entity, order=None):
+      """Add entity after all the others, or back at the place given by the
+      order it had when it was taken out."""
+      if order is None:
+         order = self.next_order
+      elif self.entities:
+         self.in_order = False
+      self.next_order = max(self.next_order, order + 1)
+      self.entities[entity] = order
+      self.by_type.setdefault(type(entity), {})[entity] = None
+      self.by_name.setdefault(entity.get_name(), {})[entity] = None
+
+
+   def remove(self, entity):
+      if entity in self.entities:
+         del self.entities[entity]
+         discard(self.by_type, type(entity), entity)
+         discard(self.by_name, entity.get_name(), entity)
+
+
+   def of_type(self, type):
+      for (cls, members) in list(self.by_type.items()):
+         if issubclass(cls, type):
+            for entity in list(members):
+               yield entity
+
+
+   def not_of_type(self, type):
+      for (cls, members) in list(self.by_type.items()):
+         if not issubclass(cls, type):
+            for entity in list(members):
+               yield entity
+
+
+   def order(self, entity):
+      return self.entities[entity]
+
+
+   def find_by_name(self, name):
+      for entity in self.by_name.get(name, ()):
+         return entity
+      return None
+
+
+   def __iter__(self):
+      if not self.in_order:
+         self.entities = dict(sorted(self.entities.items(),
+            key=lambda item: item[1]))
+         self.in_order = True
+      return iter(self.entities)
+
+
+   def __len__(self):
+      return len(self.entities)
+
+
+   def __contains__(self, entity):
+      return entity in self.entities
+
+
+def discard(view, key, entity):
+   members = view.get(key)
+   if members is not None:
+      members.pop(entity, None)
+      if not members:
+         del view[key]
@@ -0,0 +1,129 @@
+import argparse
+import chunked_grid
+import entities
+import image_store
+import occ_grid
+import random
+import save_load
+import snapshot
+import time
+import worldmodel
+
+IMAGE_LIST_FILE_NAME = 'imagelist'
+WORLD_FILE = 'gaia.sav'
+
+WORLD_COLS = 40
+WORLD_ROWS = 30
+
+# the view kept in memory when paging, as in the game's default window
+VIEW_COLS = 20
+VIEW_ROWS = 15
+PAGE_INTERVAL = 5000
+
+SIMULATED_SECONDS = 300
+TIMESTEP = 100
+
+GRIDS = {'list': occ_grid.Grid, 'array': occ_grid.ArrayGrid,
+   'chunked': chunked_grid.ChunkedGrid}
+
+
+def create_world(num_rows, num_cols, i_store, batch=False, paged=False,
+   grid=occ_grid.Grid):
+   background = entities.Background(image_store.DEFAULT_IMAGE_NAME,
+      image_store.get_images(i_store, image_store.DEFAULT_IMAGE_NAME))
+   if paged:
+      world = worldmodel.WorldModel(num_rows, num_cols, background,
+         chunked_grid.ChunkedGrid)
+      world.enable_paging(i_store)
+   else:
+      world = worldmodel.WorldModel(num_rows, num_cols, background, grid)
+   if batch:
+      world.enable_batch(i_store)
+   return world
+
+
+def actions_run(world):
+   if world.batch is not None:
+      return world.actions_run + world.batch.actions_run
+   return world.actions_run
+
+
+def format_occupancy(world):
+   counts = world.occupancy.count_by_type(0, 0, world.num_cols,
+      world.num_rows)
+   return ', '.join('%d %s' % (counts[kind], kind.__name__)
+      for kind in sorted(counts, key=lambda kind: kind.__name__))
+
+
+def run(world, seconds, timestep=TIMESTEP):
+   """Advance world through seconds of simulated time in fixed steps of
+   timestep ms, as fast as it will go.  Returns the wall clock time."""
+   start = time.time()
+   for ticks in range(world.ticks + timestep,
+      world.ticks + seconds * 1000 + 1, timestep):
+      world.update_on_time(ticks)
+      if ticks % PAGE_INTERVAL < timestep:
+         world.page(0, 0, VIEW_COLS, VIEW_ROWS)
+   return time.time() - start
+
+
+def parse_args():
+   parser = argparse.ArgumentParser(
+      description='Run a saved world without a display.')
+   parser.add_argument('world', nargs='?', default=WORLD_FILE)
+   parser.add_argument('-s', '--seconds', type=int, default=SIMULATED_SECONDS,
+      help='simulated seconds to run')
+   parser.add_argument('-t', '--timestep', type=int, default=TIMESTEP,
+      help='simulated ms per step')
+   parser.add_argument('--cols', type=int, default=WORLD_COLS)
+   parser.add_argument('--rows', type=int, default=WORLD_ROWS)
+   parser.add_argument('--seed', type=int, default=None)
+   parser.add_argument('--batch', action='store_true',
+      help='run miners and blobs through the batch engine')
+   parser.add_argument('--paged', action='store_true',
+      help='keep chunks away from the view and the actors on disk '
+      '(implies --grid chunked)')
+   parser.add_argument('--grid', choices=sorted(GRIDS), default='list',
+      help='occupancy grid the world is built on')
+   parser.add_argument('--resume', action='store_true',
+      help='treat the world file as a snapshot and carry on from it')
+   parser.add_argument('--snapshot', default=None,
+      help='write a snapshot here when the run ends')
+   return parser.parse_args()
+
+
+def main():
+   args = parse_args()
+   random.seed(args.seed)
+   i_store = image_store.load_placeholders(IMAGE_LIST_FILE_NAME)
+   world = create_world(args.rows, args.cols, i_store, args.batch,
+      args.paged, GRIDS[args.grid])
+   with open(args.world, 'r') as file:
+      if args.resume:
+         snapshot.load_snapshot(world, i_store, file)
+      else:
+         save_load.load_world(world, i_store, file, True)
+
+   elapsed = run(world, args.seconds, args.timestep)
+   events = actions_run(world)
+   print('simulated %d s in %.2f s (%.0fx real time)' %
+      (args.seconds, elapsed, args.seconds / max(elapsed, 1e-9)))
+   print('%d events, %.0f events/s, %d entities' %
+      (events, events / max(elapsed, 1e-9), len(world.get_entities())))
+   print('occupied: ' + format_occupancy(world))
+   miners = list(world.get_entities_of_type(entities.Miner))
+   print('%d ore carried by %d miners' % (sum(miner.get_resource_count()
+      for miner in miners), len(miners)))
+   if args.paged:
+      print('%d chunks in memory, %d paged out, %d page ins' %
+         (len(world.background.chunks), len(world.background.paged_out),
+         world.background.page_ins + world.occupancy.page_ins))
+
+   if args.snapshot:
+      with open(args.snapshot, 'w') as file:
+         snapshot.save_snapshot(world, file)
+   world.close_paging()
+
+
+if __name__ == '__main__':
+   main()
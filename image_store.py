@@ -1,45 +1,192 @@
-import pygame
+import concurrent.futures
+import os
+import struct
+import time
 
 DEFAULT_IMAGE_NAME = 'background_default'
 DEFAULT_IMAGE_COLOR = (128, 128, 128, 0)
 
+PLAIN_MODE = 'plain'
+RLE_MODE = 'rle'
+ATLAS_MODE = 'atlas'
+
+ATLAS_WIDTH = 1024
+
+LOAD_THREADS = 8
+CACHE_DIR = '.image_cache'
+# source mtime in ns, width, height, then the pixel format name
+CACHE_HEADER = struct.Struct('<qii4s')
+
 
 def create_default_image(tile_width, tile_height):
+   import pygame
    surf = pygame.Surface((tile_width, tile_height))
    surf.fill(DEFAULT_IMAGE_COLOR)
    return surf
 
 
-def load_images(filename, tile_width, tile_height):
-   images = {}
+def load_images(filename, tile_width, tile_height, mode=PLAIN_MODE,
+   stats=None):
+   start = time.time()
    with open(filename) as fstr:
-      for line in fstr:
-         process_image_line(images, line)
+      lines = [attrs for attrs in (line.split() for line in fstr)
+         if len(attrs) >= 2]
+
+   decoded = decode_images([attrs[1] for attrs in lines], stats)
+   decode_done = time.time()
+
+   images = {}
+   if mode == ATLAS_MODE:
+      load_atlas(images, lines, decoded)
+   else:
+      for attrs in lines:
+         add_image(images, attrs, decoded[attrs[1]].convert(),
+            mode == RLE_MODE)
 
    if DEFAULT_IMAGE_NAME not in images:
       default_image = create_default_image(tile_width, tile_height)
       images[DEFAULT_IMAGE_NAME] = [default_image]
 
+   if stats is not None:
+      stats['images'] = len(lines)
+      stats['decode_time'] = decode_done - start
+      stats['convert_time'] = time.time() - decode_done
+      stats['total_time'] = time.time() - start
+
    return images
 
 
-def process_image_line(images, line):
-   attrs = line.split()
-   if len(attrs) >= 2:
+def load_placeholders(filename):
+   """The keys of an image list, each with None for every image listed,
+   for worlds that are simulated but never drawn."""
+   images = {}
+   with open(filename) as fstr:
+      for attrs in (line.split() for line in fstr):
+         if len(attrs) >= 2:
+            images.setdefault(attrs[0], []).append(None)
+   images.setdefault(DEFAULT_IMAGE_NAME, [None])
+   return images
+
+
+def format_stats(stats):
+   return ('loaded %d images (%d from cache) in %.1f ms: '
+      'decode %.1f ms, convert %.1f ms' % (stats['images'],
+      stats['cache_hits'], stats['total_time'] * 1000,
+      stats['decode_time'] * 1000, stats['convert_time'] * 1000))
+
+
+def decode_images(paths, stats=None):
+   """Decode each distinct file on a thread pool, reusing the raw pixels
+   cached from an earlier launch when the file has not changed."""
+   paths = sorted(set(paths))
+   with concurrent.futures.ThreadPoolExecutor(LOAD_THREADS) as pool:
+      results = list(pool.map(load_cached, paths))
+
+   if stats is not None:
+      stats['cache_hits'] = sum(1 for (img, hit) in results if hit)
+   return dict((path, img) for (path, (img, hit)) in zip(paths, results))
+
+
+def cache_path(path):
+   return os.path.join(CACHE_DIR,
+      os.path.normpath(path).replace(os.sep, '_') + '.raw')
+
+
+def load_cached(path):
+   import pygame
+   mtime = os.stat(path).st_mtime_ns
+   try:
+      with open(cache_path(path), 'rb') as fstr:
+         (cached_mtime, width, height, fmt) = CACHE_HEADER.unpack(
+            fstr.read(CACHE_HEADER.size))
+         if cached_mtime == mtime:
+            fmt = fmt.decode('ascii').strip()
+            return (pygame.image.frombytes(fstr.read(), (width, height), fmt),
+               True)
+   except (OSError, struct.error, ValueError):
+      pass
+
+   img = pygame.image.load(path)
+   save_cached(path, mtime, img)
+   return (img, False)
+
+
+def save_cached(path, mtime, img):
+   import pygame
+   fmt = 'RGBA' if img.get_flags() & pygame.SRCALPHA else 'RGB'
+   (width, height) = img.get_size()
+   try:
+      os.makedirs(CACHE_DIR, exist_ok=True)
+      with open(cache_path(path), 'wb') as fstr:
+         fstr.write(CACHE_HEADER.pack(mtime, width, height,
+            fmt.ljust(4).encode('ascii')))
+         fstr.write(pygame.image.tobytes(img, fmt))
+   except OSError:
+      pass
+
+
+def add_image(images, attrs, img, rle=False):
+   import pygame
+   if img:
       key = attrs[0]
-      img = pygame.image.load(attrs[1]).convert()      
-
-      if img:
-         imgs = get_images_internal(images, key)
-         imgs.append(img)
-         images[key] = imgs
-
-         if len(attrs) == 6:
-            r = int(attrs[2])
-            g = int(attrs[3])
-            b = int(attrs[4])
-            a = int(attrs[5])
-            img.set_colorkey(pygame.Color(r, g, b, a))
+      imgs = get_images_internal(images, key)
+      imgs.append(img)
+      images[key] = imgs
+
+      color = get_colorkey(attrs)
+      if color:
+         img.set_colorkey(color, pygame.RLEACCEL if rle else 0)
+
+
+def get_colorkey(attrs):
+   import pygame
+   if len(attrs) == 6:
+      r = int(attrs[2])
+      g = int(attrs[3])
+      b = int(attrs[4])
+      a = int(attrs[5])
+      return pygame.Color(r, g, b, a)
+   return None
+
+
+def load_atlas(images, lines, decoded):
+   """Pack every image into one per-pixel alpha surface, with colour keys
+   baked into the alpha channel, and hand out subsurfaces of it."""
+   import pygame
+   entries = []
+   for attrs in lines:
+      img = decoded[attrs[1]].copy()
+      color = get_colorkey(attrs)
+      if color:
+         img.set_colorkey(color)
+      entries.append((attrs[0], img))
+
+   (placements, width, height) = pack_shelves(
+      [img.get_size() for (key, img) in entries], ATLAS_WIDTH)
+   atlas = pygame.Surface((max(width, 1), max(height, 1)), pygame.SRCALPHA)
+   atlas.fill((0, 0, 0, 0))
+   for ((key, img), pos) in zip(entries, placements):
+      atlas.blit(img, pos)
+   atlas = atlas.convert_alpha()
+
+   for ((key, img), pos) in zip(entries, placements):
+      imgs = get_images_internal(images, key)
+      imgs.append(atlas.subsurface(pygame.Rect(pos, img.get_size())))
+      images[key] = imgs
+
+
+def pack_shelves(sizes, max_width):
+   """Place rectangles left to right in rows no wider than max_width."""
+   placements = []
+   (x, y, shelf_height, width) = (0, 0, 0, 0)
+   for (w, h) in sizes:
+      if x > 0 and x + w > max_width:
+         (x, y, shelf_height) = (0, y + shelf_height, 0)
+      placements.append((x, y))
+      x += w
+      shelf_height = max(shelf_height, h)
+      width = max(width, x)
+   return (placements, width, y + shelf_height)
 
 
 def get_images_internal(images, key):
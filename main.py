@@ -1,4 +1,7 @@
+import animation
+import chunked_grid
 import controller
+import dirty_region
 import entities
 import image_store
 import pygame
@@ -35,8 +38,10 @@ def main():
    random.seed()
    pygame.init()
    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+   load_stats = {}
    i_store = image_store.load_images(IMAGE_LIST_FILE_NAME,
-      TILE_WIDTH, TILE_HEIGHT)
+      TILE_WIDTH, TILE_HEIGHT, stats=load_stats)
+   print(image_store.format_stats(load_stats))
 
    num_cols = SCREEN_WIDTH // TILE_WIDTH * WORLD_WIDTH_SCALE
    num_rows = SCREEN_HEIGHT // TILE_HEIGHT * WORLD_HEIGHT_SCALE
@@ -44,7 +49,9 @@ def main():
    default_background = create_default_background(
       image_store.get_images(i_store, image_store.DEFAULT_IMAGE_NAME))
 
-   world = worldmodel.WorldModel(num_rows, num_cols, default_background)
+   world = worldmodel.WorldModel(num_rows, num_cols, default_background,
+      chunked_grid.ChunkedGrid)
+   world.enable_paging(i_store)
    view = worldview.WorldView(SCREEN_WIDTH // TILE_WIDTH,
       SCREEN_HEIGHT // TILE_HEIGHT, screen, world, TILE_WIDTH, TILE_HEIGHT)
 
@@ -53,6 +60,10 @@ def main():
    view.update_view()
 
    controller.activity_loop(view, world)
+   print(animation.format_stats(world.animations.stats(world.ticks)))
+   print(worldview.format_stats(view))
+   print(dirty_region.format_stats(view.dirty))
+   world.close_paging()
 
 
 if __name__ == '__main__':
@@ -1,3 +1,10 @@
+import point
+
+try:
+   import numpy
+except ImportError:
+   numpy = None
+
 # define occupancy value
 EMPTY = 0
 GATHERER = 1
@@ -23,3 +30,183 @@ class Grid:
    def get_cell(self, point):
       return self.cells[point.y][point.x]
 
+
+   def get_row(self, y):
+      return list(self.cells[y])
+
+
+   def fill_row(self, point, values):
+      """Set the cells from point rightwards to values."""
+      self.cells[point.y][point.x:point.x + len(values)] = values
+
+
+   def clip(self, left, top, width, height):
+      right = min(left + width, self.width)
+      bottom = min(top + height, self.height)
+      left = max(left, 0)
+      top = max(top, 0)
+      return (left, top, max(left, right), max(top, bottom))
+
+
+   def occupied_mask(self, left, top, width, height):
+      (left, top, right, bottom) = self.clip(left, top, width, height)
+      return [[cell is not None for cell in self.get_row(y)[left:right]]
+         for y in range(top, bottom)]
+
+
+   def count_by_type(self, left, top, width, height):
+      (left, top, right, bottom) = self.clip(left, top, width, height)
+      counts = {}
+      for y in range(top, bottom):
+         for cell in self.get_row(y)[left:right]:
+            if cell is not None:
+               counts[type(cell)] = counts.get(type(cell), 0) + 1
+      return counts
+
+
+   def free_cells(self, left, top, width, height):
+      (left, top, right, bottom) = self.clip(left, top, width, height)
+      return [point.Point(x, y) for y in range(top, bottom)
+         for (x, cell) in enumerate(self.get_row(y)[left:right], left)
+         if cell is None]
+
+
+# type codes handed out to the classes stored in an ArrayGrid; 0 is empty
+TYPE_CODES = {}
+CODE_TYPES = [type(None)]
+
+def type_code(value):
+   if value is None:
+      return EMPTY
+   code = TYPE_CODES.get(type(value))
+   if code is None:
+      code = len(CODE_TYPES)
+      TYPE_CODES[type(value)] = code
+      CODE_TYPES.append(type(value))
+   return code
+
+
+class ArrayGrid(Grid):
+   """Grid keeping a type code and a value id per cell in NumPy arrays,
+   so that whole regions can be queried at once."""
+   def __init__(self, width, height, occupancy_value):
+      if numpy is None:
+         raise ImportError('ArrayGrid requires numpy')
+      self.width = width
+      self.height = height
+      self.values = [None]
+      self.value_ids = {}
+      self.refs = [0]
+      self.free = []
+      self.ids = numpy.zeros((height, width), numpy.int32)
+      self.codes = numpy.zeros((height, width), numpy.int16)
+
+      slot = self.intern(occupancy_value, width * height)
+      self.ids[:] = slot
+      self.codes[:] = type_code(occupancy_value)
+
+
+   def intern(self, value, count=1):
+      if value is None:
+         return 0
+      slot = self.value_ids.get(id(value))
+      if slot is None:
+         if self.free:
+            slot = self.free.pop()
+            self.values[slot] = value
+         else:
+            slot = len(self.values)
+            self.values.append(value)
+            self.refs.append(0)
+         self.value_ids[id(value)] = slot
+      self.refs[slot] += count
+      return slot
+
+
+   def release(self, slot):
+      if slot:
+         self.refs[slot] -= 1
+         if self.refs[slot] == 0:
+            del self.value_ids[id(self.values[slot])]
+            self.values[slot] = None
+            self.free.append(slot)
+
+
+   def set_cell(self, point, value):
+      self.release(int(self.ids[point.y, point.x]))
+      self.ids[point.y, point.x] = self.intern(value)
+      self.codes[point.y, point.x] = type_code(value)
+
+
+   def get_cell(self, point):
+      return self.values[self.ids[point.y, point.x]]
+
+
+   def get_row(self, y):
+      return [self.values[slot] for slot in self.ids[y].tolist()]
+
+
+   def fill_row(self, point, values):
+      row = point.y
+      for slot in self.ids[row, point.x:point.x + len(values)].tolist():
+         self.release(slot)
+      self.ids[row, point.x:point.x + len(values)] = [self.intern(value)
+         for value in values]
+      self.codes[row, point.x:point.x + len(values)] = [type_code(value)
+         for value in values]
+
+
+   def occupied_mask(self, left, top, width, height):
+      (left, top, right, bottom) = self.clip(left, top, width, height)
+      return self.ids[top:bottom, left:right] != 0
+
+
+   def count_by_type(self, left, top, width, height):
+      (left, top, right, bottom) = self.clip(left, top, width, height)
+      counts = numpy.bincount(self.codes[top:bottom, left:right].ravel(),
+         minlength=len(CODE_TYPES))
+      return dict((CODE_TYPES[code], int(counts[code]))
+         for code in numpy.flatnonzero(counts) if code != EMPTY)
+
+
+   def free_cells(self, left, top, width, height):
+      (left, top, right, bottom) = self.clip(left, top, width, height)
+      (ys, xs) = numpy.nonzero(self.ids[top:bottom, left:right] == 0)
+      return [point.Point(x + left, y + top)
+         for (y, x) in zip(ys.tolist(), xs.tolist())]
+
+
+class FreeCellMap:
+   """One bitset per row with a bit set for every empty cell."""
+   def __init__(self, width, height):
+      self.width = width
+      self.height = height
+      self.rows = [(1 << width) - 1] * height
+
+
+   def set_free(self, point, free):
+      if free:
+         self.rows[point.y] |= 1 << point.x
+      else:
+         self.rows[point.y] &= ~(1 << point.x)
+
+
+   def is_free(self, point):
+      return bool(self.rows[point.y] >> point.x & 1)
+
+
+   def first_free(self, left, top, right, bottom):
+      """First free cell in row-major order within the inclusive window,
+      or None if the window is full."""
+      left = max(left, 0)
+      right = min(right, self.width - 1)
+      if left > right:
+         return None
+
+      window = ((1 << (right - left + 1)) - 1) << left
+      for y in range(max(top, 0), min(bottom, self.height - 1) + 1):
+         free = self.rows[y] & window
+         if free:
+            return point.Point((free & -free).bit_length() - 1, y)
+
+      return None
@@ -0,0 +1,104 @@
+import heapq
+import point
+
+# give up on a route after expanding this many tiles
+SEARCH_LIMIT = 4096
+
+NEIGHBORS = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+
+def find_path(start, goal, passable, limit=SEARCH_LIMIT):
+   """A* over the four-connected grid.  Returns the tiles to step through
+   to end up adjacent to goal, or None if no such route was found."""
+   start = (start.x, start.y)
+   goal = (goal.x, goal.y)
+   frontier = [(estimate(start, goal), 0, start)]
+   came_from = {start: None}
+   cost = {start: 0}
+
+   while frontier and limit > 0:
+      (_, steps, current) = heapq.heappop(frontier)
+      if steps > cost[current]:
+         continue
+      if estimate(current, goal) == 0 and current != goal:
+         return build_path(came_from, current)
+      limit -= 1
+
+      for (dx, dy) in NEIGHBORS:
+         tile = (current[0] + dx, current[1] + dy)
+         if (steps + 1 < cost.get(tile, steps + 2) and
+            passable(point.Point(tile[0], tile[1]))):
+            cost[tile] = steps + 1
+            came_from[tile] = current
+            heapq.heappush(frontier,
+               (steps + 1 + estimate(tile, goal), steps + 1, tile))
+
+   return None
+
+
+def estimate(tile, goal):
+   return max(abs(tile[0] - goal[0]) + abs(tile[1] - goal[1]) - 1, 0)
+
+
+def build_path(came_from, tile):
+   path = []
+   while came_from[tile] is not None:
+      path.append(tile)
+      tile = came_from[tile]
+   path.reverse()
+   return path
+
+
+class RouteCache:
+   def __init__(self):
+      self.routes = {}
+      self.watchers = {}
+
+
+   def next_step(self, entity, dest_pt):
+      route = self.routes.get(entity)
+      if route and route.dest == (dest_pt.x, dest_pt.y) and route.steps:
+         (x, y) = route.steps[0]
+         return point.Point(x, y)
+      return None
+
+
+   def store(self, entity, dest_pt, steps):
+      self.forget(entity)
+      self.routes[entity] = Route((dest_pt.x, dest_pt.y), steps)
+      for tile in steps:
+         self.watchers.setdefault(tile, set()).add(entity)
+
+
+   def advance(self, entity, pt):
+      route = self.routes.get(entity)
+      if route:
+         if route.steps and route.steps[0] == (pt.x, pt.y):
+            self.unwatch(entity, route.steps.pop(0))
+         else:
+            self.forget(entity)
+
+
+   def forget(self, entity):
+      route = self.routes.pop(entity, None)
+      if route:
+         for tile in route.steps:
+            self.unwatch(entity, tile)
+
+
+   def invalidate(self, pt):
+      for entity in list(self.watchers.get((pt.x, pt.y), ())):
+         self.forget(entity)
+
+
+   def unwatch(self, entity, tile):
+      watching = self.watchers.get(tile)
+      if watching:
+         watching.discard(entity)
+         if not watching:
+            del self.watchers[tile]
+
+
+class Route:
+   def __init__(self, dest, steps):
+      self.dest = dest
+      self.steps = steps
@@ -1,4 +1,47 @@
-class Point:
-   def __init__(self, x, y):
-      self.x = x
-      self.y = y
+# points with both coordinates in [POINT_CACHE_MIN, POINT_CACHE_MAX) are
+# created once and shared
+POINT_CACHE_MIN = -1
+POINT_CACHE_MAX = 256
+
+class Point(object):
+   __slots__ = ('x', 'y')
+
+   def __new__(cls, x, y):
+      if (POINT_CACHE_MIN <= x < POINT_CACHE_MAX and
+         POINT_CACHE_MIN <= y < POINT_CACHE_MAX):
+         row = CACHE[y - POINT_CACHE_MIN]
+         pt = row[x - POINT_CACHE_MIN]
+         if pt is None:
+            pt = row[x - POINT_CACHE_MIN] = create(cls, x, y)
+         return pt
+      return create(cls, x, y)
+
+   def __setattr__(self, name, value):
+      raise AttributeError('Point is immutable')
+
+   def __eq__(self, other):
+      return (isinstance(other, Point) and
+         self.x == other.x and self.y == other.y)
+
+   def __ne__(self, other):
+      return not self == other
+
+   def __hash__(self):
+      return hash((self.x, self.y))
+
+   def __reduce__(self):
+      return (Point, (self.x, self.y))
+
+   def __repr__(self):
+      return 'Point(%d, %d)' % (self.x, self.y)
+
+
+def create(cls, x, y):
+   pt = object.__new__(cls)
+   object.__setattr__(pt, 'x', x)
+   object.__setattr__(pt, 'y', y)
+   return pt
+
+
+CACHE = [[None] * (POINT_CACHE_MAX - POINT_CACHE_MIN)
+   for y in range(POINT_CACHE_MIN, POINT_CACHE_MAX)]
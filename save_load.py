@@ -12,6 +12,13 @@ BGND_NAME = 1
 BGND_COL = 2
 BGND_ROW = 3
 
+BGND_RUN_KEY = 'background_run'
+BGND_RUN_NUM_PROPERTIES = 5
+BGND_RUN_NAME = 1
+BGND_RUN_COL = 2
+BGND_RUN_ROW = 3
+BGND_RUN_LENGTH = 4
+
 MINER_KEY = 'miner'
 MINER_NUM_PROPERTIES = 7
 MINER_NAME = 1
@@ -21,6 +28,23 @@ MINER_ROW = 3
 MINER_RATE = 5
 MINER_ANIMATION_RATE = 6
 
+MINER_FULL_KEY = 'miner_full'
+
+BLOB_KEY = 'blob'
+BLOB_NUM_PROPERTIES = 6
+BLOB_NAME = 1
+BLOB_COL = 2
+BLOB_ROW = 3
+BLOB_RATE = 4
+BLOB_ANIMATION_RATE = 5
+
+QUAKE_KEY = 'quake'
+QUAKE_NUM_PROPERTIES = 5
+QUAKE_NAME = 1
+QUAKE_COL = 2
+QUAKE_ROW = 3
+QUAKE_ANIMATION_RATE = 4
+
 OBSTACLE_KEY = 'obstacle'
 OBSTACLE_NUM_PROPERTIES = 4
 OBSTACLE_NAME = 1
@@ -57,16 +81,31 @@ def save_world(world, file):
    save_background(world, file)
 
 def save_entities(world, file):
-   for entity in world.get_entities():
-      file.write(entity.entity_string() + '\n')
+   for record in entity_records(world):
+      file.write(record + '\n')
+
+
+def entity_records(world):
+   return world.entity_records()
 
 
 def save_background(world, file):
    for row in range(0, world.num_rows):
-      for col in range(0, world.num_cols):
-         file.write('background ' +
-            world.get_background(point.Point(col, row)).get_name() +
-            ' ' + str(col) + ' ' + str(row) + '\n')
+      names = [bgnd.get_name() for bgnd in world.get_background_row(row)]
+      for (name, col, length) in name_runs(names):
+         file.write('background_run ' + name + ' ' + str(col) + ' ' +
+            str(row) + ' ' + str(length) + '\n')
+
+
+def name_runs(names):
+   """(name, start, length) for each run of equal names."""
+   runs = []
+   for (col, name) in enumerate(names):
+      if runs and runs[-1][0] == name:
+         runs[-1][2] += 1
+      else:
+         runs.append([name, col, 1])
+   return [tuple(run) for run in runs]
 
 
 def load_world(world, images, file, run=False):
@@ -75,6 +114,8 @@ def load_world(world, images, file, run=False):
       if properties:
          if properties[PROPERTY_KEY] == BGND_KEY:
             add_background(world, properties, images)
+         elif properties[PROPERTY_KEY] == BGND_RUN_KEY:
+            add_background_run(world, properties, images)
          else:
             add_entity(world, properties, images, run)
 
@@ -82,16 +123,29 @@ def load_world(world, images, file, run=False):
 def add_background(world, properties, i_store):
    if len(properties) >= BGND_NUM_PROPERTIES:
       pt = point.Point(int(properties[BGND_COL]), int(properties[BGND_ROW]))
-      name = properties[BGND_NAME]
       world.set_background(pt,
-         entities.Background(name, image_store.get_images(i_store, name)))
+         create_background(properties[BGND_NAME], i_store))
+
+
+def add_background_run(world, properties, i_store):
+   if len(properties) >= BGND_RUN_NUM_PROPERTIES:
+      pt = point.Point(int(properties[BGND_RUN_COL]),
+         int(properties[BGND_RUN_ROW]))
+      bgnd = create_background(properties[BGND_RUN_NAME], i_store)
+      world.set_background_run(pt,
+         [bgnd] * int(properties[BGND_RUN_LENGTH]))
+
+
+def create_background(name, i_store):
+   return entities.Background(name, image_store.get_images(i_store, name))
 
 
 def add_entity(world, properties, i_store, run):
    new_entity = create_from_properties(properties, i_store)
    if new_entity:
       world.add_entity(new_entity)
-      if run:
+      # entities outside a smaller world are dropped, so nothing runs them
+      if run and world.within_bounds(new_entity.get_position()):
          schedule_entity(world, new_entity, i_store)
 
 
@@ -100,6 +154,12 @@ def create_from_properties(properties, i_store):
    if properties:
       if key == MINER_KEY:
          return create_miner(properties, i_store)
+      elif key == MINER_FULL_KEY:
+         return create_miner_full(properties, i_store)
+      elif key == BLOB_KEY:
+         return create_blob(properties, i_store)
+      elif key == QUAKE_KEY:
+         return create_quake(properties, i_store)
       elif key == VEIN_KEY:
          return create_vein(properties, i_store)
       elif key == ORE_KEY:
@@ -124,6 +184,39 @@ def create_miner(properties, i_store):
       return None
 
 
+def create_miner_full(properties, i_store):
+   if len(properties) == MINER_NUM_PROPERTIES:
+      return entities.MinerFull(properties[MINER_NAME],
+         int(properties[MINER_LIMIT]),
+         point.Point(int(properties[MINER_COL]), int(properties[MINER_ROW])),
+         int(properties[MINER_RATE]),
+         image_store.get_images(i_store, MINER_KEY),
+         int(properties[MINER_ANIMATION_RATE]))
+   else:
+      return None
+
+
+def create_blob(properties, i_store):
+   if len(properties) == BLOB_NUM_PROPERTIES:
+      return entities.OreBlob(properties[BLOB_NAME],
+         point.Point(int(properties[BLOB_COL]), int(properties[BLOB_ROW])),
+         int(properties[BLOB_RATE]),
+         image_store.get_images(i_store, properties[PROPERTY_KEY]),
+         int(properties[BLOB_ANIMATION_RATE]))
+   else:
+      return None
+
+
+def create_quake(properties, i_store):
+   if len(properties) == QUAKE_NUM_PROPERTIES:
+      return entities.Quake(properties[QUAKE_NAME],
+         point.Point(int(properties[QUAKE_COL]), int(properties[QUAKE_ROW])),
+         image_store.get_images(i_store, properties[PROPERTY_KEY]),
+         int(properties[QUAKE_ANIMATION_RATE]))
+   else:
+      return None
+
+
 def create_vein(properties, i_store):
    if len(properties) == VEIN_NUM_PROPERTIES:
       vein = entities.Vein(properties[VEIN_NAME], int(properties[VEIN_RATE]),
@@ -168,8 +261,12 @@ def create_obstacle(properties, i_store):
 
 
 def schedule_entity(world, entity, i_store):
-   if isinstance(entity, entities.MinerNotFull):
+   if isinstance(entity, entities.Miner):
       world.schedule_miner(entity, 0, i_store)
+   elif isinstance(entity, entities.OreBlob):
+      world.schedule_blob(entity, 0, i_store)
+   elif isinstance(entity, entities.Quake):
+      world.schedule_quake(entity, 0)
    elif isinstance(entity, entities.Vein):
       world.schedule_vein(entity, 0, i_store)
    elif isinstance(entity, entities.Ore):
@@ -0,0 +1,258 @@
+import array
+import mmap
+import point
+import save_load
+import struct
+import sys
+
+MAGIC = b'WSAV'
+VERSION = 1
+
+# magic, version, flags, columns, rows, palette size, entity count
+HEADER = struct.Struct('<4sHHIIII')
+NAME_LENGTH = struct.Struct('<H')
+TILE = struct.Struct('<H')
+# key code, number of integer fields, name length; then the name and fields
+ENTITY = struct.Struct('<BBH')
+FIELD = struct.Struct('<i')
+
+# tile index for cells the file leaves at the world's default background
+NO_TILE = 0xffff
+
+ENTITY_KEYS = [save_load.MINER_KEY, save_load.VEIN_KEY, save_load.ORE_KEY,
+   save_load.SMITH_KEY, save_load.OBSTACLE_KEY, save_load.MINER_FULL_KEY,
+   save_load.BLOB_KEY, save_load.QUAKE_KEY]
+ENTITY_CODES = dict((key, code) for (code, key) in enumerate(ENTITY_KEYS))
+
+# field layouts by field count, shared by every record of that size
+FIELDS = {}
+
+
+class WorldData:
+   """The contents of a world file: a background palette, one palette index
+   per tile in row-major order, and entity property lists laid out as in the
+   text format.  Fields after the name may be ints or their text."""
+   def __init__(self, num_cols, num_rows, palette, tiles, records):
+      self.num_cols = num_cols
+      self.num_rows = num_rows
+      self.palette = palette
+      self.tiles = tiles
+      self.records = records
+
+
+def world_data(world):
+   palette = []
+   codes = {}
+   tiles = array.array('H')
+   for row in range(world.num_rows):
+      for bgnd in world.get_background_row(row):
+         name = bgnd.get_name()
+         code = codes.get(name)
+         if code is None:
+            code = codes[name] = len(palette)
+            palette.append(name)
+         tiles.append(code)
+
+   records = [record.split() for record in world.entity_records()]
+   return WorldData(world.num_cols, world.num_rows, palette, tiles,
+      [properties for properties in records if properties[0] in ENTITY_CODES])
+
+
+def write(data, file):
+   file.write(HEADER.pack(MAGIC, VERSION, 0, data.num_cols, data.num_rows,
+      len(data.palette), len(data.records)))
+   for name in data.palette:
+      encoded = name.encode('utf-8')
+      file.write(NAME_LENGTH.pack(len(encoded)) + encoded)
+
+   tiles = array.array('H', data.tiles)
+   if sys.byteorder != 'little':
+      tiles.byteswap()
+   file.write(tiles.tobytes())
+
+   for properties in data.records:
+      name = properties[1].encode('utf-8')
+      fields = [int(value) for value in properties[2:]]
+      file.write(ENTITY.pack(ENTITY_CODES[properties[0]], len(fields),
+         len(name)))
+      file.write(name)
+      file.write(fields_struct(len(fields)).pack(*fields))
+
+
+def save_world(world, filename):
+   with open(filename, 'wb') as file:
+      write(world_data(world), file)
+
+
+def read_header(buf):
+   if len(buf) < HEADER.size:
+      raise ValueError('not a world file')
+   (magic, version, flags, num_cols, num_rows, palette_size,
+      entity_count) = HEADER.unpack_from(buf, 0)
+   if magic != MAGIC:
+      raise ValueError('not a world file')
+   if version != VERSION:
+      raise ValueError('unsupported world file version %d' % version)
+   return (num_cols, num_rows, palette_size, entity_count)
+
+
+def read_palette(buf, offset, count):
+   palette = []
+   for i in range(count):
+      (length,) = NAME_LENGTH.unpack_from(buf, offset)
+      offset += NAME_LENGTH.size
+      palette.append(bytes(buf[offset:offset + length]).decode('utf-8'))
+      offset += length
+   return (palette, offset)
+
+
+def fields_struct(count):
+   fields = FIELDS.get(count)
+   if fields is None:
+      fields = FIELDS[count] = struct.Struct('<%di' % count)
+   return fields
+
+
+def read_records(buf, offset, count):
+   """Entity property lists with their fields left as ints, which the
+   save_load creators take as readily as text."""
+   records = []
+   for i in range(count):
+      (code, field_count, name_length) = ENTITY.unpack_from(buf, offset)
+      offset += ENTITY.size
+      name = str(buf[offset:offset + name_length], 'utf-8')
+      offset += name_length
+      fields = fields_struct(field_count)
+      records.append([ENTITY_KEYS[code], name] +
+         list(fields.unpack_from(buf, offset)))
+      offset += fields.size
+   return records
+
+
+def tile_view(buf, offset, count):
+   """The tile indices as unsigned shorts, read in place when the machine
+   byte order matches the file."""
+   if sys.byteorder == 'little':
+      return buf[offset:offset + count * TILE.size].cast('H')
+   return struct.unpack_from('<%dH' % count, buf, offset)
+
+
+def read(buf):
+   (num_cols, num_rows, palette_size, entity_count) = read_header(buf)
+   (palette, offset) = read_palette(buf, HEADER.size, palette_size)
+   tiles = tile_view(buf, offset, num_cols * num_rows)
+   offset += num_cols * num_rows * TILE.size
+   records = read_records(buf, offset, entity_count)
+   return WorldData(num_cols, num_rows, palette, tiles, records)
+
+
+def load_world(world, i_store, filename, run=False):
+   with open(filename, 'rb') as file:
+      with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+         with memoryview(mapped) as buf:
+            data = read(buf)
+            fill_background(world, i_store, data)
+            if isinstance(data.tiles, memoryview):
+               data.tiles.release()
+
+   for properties in data.records:
+      save_load.add_entity(world, properties, i_store, run)
+
+
+def fill_background(world, i_store, data):
+   backgrounds = [save_load.create_background(name, i_store)
+      for name in data.palette]
+   width = min(data.num_cols, world.num_cols)
+   for row in range(min(data.num_rows, world.num_rows)):
+      start = row * data.num_cols
+      codes = list(data.tiles[start:start + width])
+      if NO_TILE in codes:
+         for (col, code) in enumerate(codes):
+            if code != NO_TILE:
+               world.set_background(point.Point(col, row), backgrounds[code])
+      else:
+         world.set_background_run(point.Point(0, row),
+            [backgrounds[code] for code in codes])
+
+
+def read_text(file):
+   """WorldData for a text world file, sized to fit its background records.
+   Tiles the file does not mention keep the world's default background."""
+   backgrounds = {}
+   records = []
+   for line in file:
+      properties = line.split()
+      if not properties:
+         continue
+      if properties[save_load.PROPERTY_KEY] == save_load.BGND_KEY:
+         if len(properties) >= save_load.BGND_NUM_PROPERTIES:
+            backgrounds[(int(properties[save_load.BGND_COL]),
+               int(properties[save_load.BGND_ROW]))] = \
+               properties[save_load.BGND_NAME]
+      elif properties[save_load.PROPERTY_KEY] == save_load.BGND_RUN_KEY:
+         if len(properties) >= save_load.BGND_RUN_NUM_PROPERTIES:
+            col = int(properties[save_load.BGND_RUN_COL])
+            row = int(properties[save_load.BGND_RUN_ROW])
+            for x in range(col,
+               col + int(properties[save_load.BGND_RUN_LENGTH])):
+               backgrounds[(x, row)] = properties[save_load.BGND_RUN_NAME]
+      elif properties[save_load.PROPERTY_KEY] in ENTITY_CODES:
+         records.append(properties)
+
+   num_cols = max([col + 1 for (col, row) in backgrounds] or [0])
+   num_rows = max([row + 1 for (col, row) in backgrounds] or [0])
+   palette = sorted(set(backgrounds.values()))
+   codes = dict((name, code) for (code, name) in enumerate(palette))
+   tiles = [NO_TILE] * (num_cols * num_rows)
+   for ((col, row), name) in backgrounds.items():
+      tiles[row * num_cols + col] = codes[name]
+   return WorldData(num_cols, num_rows, palette, tiles, records)
+
+
+def write_text(data, file):
+   for properties in data.records:
+      file.write(' '.join([str(value) for value in properties]) + '\n')
+   for row in range(data.num_rows):
+      start = row * data.num_cols
+      names = [None if code == NO_TILE else data.palette[code]
+         for code in data.tiles[start:start + data.num_cols]]
+      for (name, col, length) in save_load.name_runs(names):
+         if name is not None:
+            file.write('background_run ' + name + ' ' + str(col) + ' ' +
+               str(row) + ' ' + str(length) + '\n')
+
+
+def text_to_binary(text_filename, filename):
+   with open(text_filename, 'r') as file:
+      data = read_text(file)
+   with open(filename, 'wb') as file:
+      write(data, file)
+
+
+def binary_to_text(filename, text_filename):
+   with open(filename, 'rb') as file:
+      data = read(memoryview(file.read()))
+   with open(text_filename, 'w') as file:
+      write_text(data, file)
+
+
+def is_binary(filename):
+   with open(filename, 'rb') as file:
+      return file.read(len(MAGIC)) == MAGIC
+
+
+def main():
+   if len(sys.argv) != 3:
+      print('usage: %s <source> <destination>' % sys.argv[0])
+      print('converts a text world file to binary or back, by its contents')
+      sys.exit(1)
+
+   (source, destination) = sys.argv[1:]
+   if is_binary(source):
+      binary_to_text(source, destination)
+   else:
+      text_to_binary(source, destination)
+
+
+if __name__ == '__main__':
+   main()
@@ -0,0 +1,81 @@
+import heapq
+
+# rebuild the heap once cancelled entries outnumber the live ones
+COMPACT_MIN_SIZE = 64
+
+class Scheduler:
+   def __init__(self):
+      self.heap = []
+      self.next_seq = 0
+      self.cancelled = 0
+
+
+   def sequence(self, seq=None):
+      """A new sequence number for breaking ties between equal due times;
+      anything else scheduled alongside the heap draws from here too.  A
+      restored seq is kept, and later numbers go above it."""
+      if seq is None:
+         seq = self.next_seq
+      self.next_seq = max(self.next_seq, seq + 1)
+      return seq
+
+
+   def insert(self, item, ord, owner=None, kind=None, seq=None):
+      entry = ScheduledItem(item, ord, self.sequence(seq), owner, kind)
+      heapq.heappush(self.heap, entry)
+      return entry
+
+
+   def cancel(self, entry):
+      if not entry.cancelled:
+         entry.cancelled = True
+         self.cancelled += 1
+         self.compact()
+
+
+   def head(self):
+      self.discard_cancelled()
+      return self.heap[0] if self.heap else None
+
+
+   def pop(self):
+      self.discard_cancelled()
+      if self.heap:
+         return heapq.heappop(self.heap)
+
+
+   def discard_cancelled(self):
+      while self.heap and self.heap[0].cancelled:
+         heapq.heappop(self.heap)
+         self.cancelled -= 1
+
+
+   def compact(self):
+      if (len(self.heap) > COMPACT_MIN_SIZE and
+         self.cancelled * 2 > len(self.heap)):
+         self.heap = [entry for entry in self.heap if not entry.cancelled]
+         heapq.heapify(self.heap)
+         self.cancelled = 0
+
+
+   def __len__(self):
+      return len(self.heap) - self.cancelled
+
+
+   def entries(self):
+      """The live entries in the order they will be popped."""
+      return sorted(entry for entry in self.heap if not entry.cancelled)
+
+
+class ScheduledItem:
+   def __init__(self, item, ord, seq, owner=None, kind=None):
+      self.item = item
+      self.ord = ord
+      self.seq = seq
+      self.owner = owner
+      self.kind = kind
+      self.cancelled = False
+
+
+   def __lt__(a, b):
+      return (a.ord, a.seq) < (b.ord, b.seq)
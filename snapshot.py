@@ -0,0 +1,94 @@
+import entities
+import random
+import save_load
+
+# a snapshot is a text world file followed by the running state; entities
+# are referred to by their position in the file
+TICKS_KEY = 'ticks'
+RANDOM_KEY = 'random'
+RESOURCES_KEY = 'resources'
+ANIMATION_KEY = 'animation'
+ACTION_KEY = 'action'
+SEQUENCE_KEY = 'sequence'
+
+
+def save_snapshot(world, file):
+   """Write world with everything needed to carry on running it: the
+   simulated time, RNG state, resource counts, animation frames and every
+   pending action with its due time and sequence number."""
+   for record in records(world):
+      file.write(record + '\n')
+   save_load.save_background(world, file)
+
+
+def records(world):
+   """Every line of the snapshot of world except the background."""
+   saved = world.saved_entities()
+   entity_list = [entity for (entity, record) in saved]
+   indexes = dict((entity, i) for (i, entity) in enumerate(entity_list)
+      if entity is not None)
+   lines = [record for (entity, record) in saved]
+
+   lines.append(' '.join([TICKS_KEY, str(world.ticks)]))
+   (version, state, gauss_next) = random.getstate()
+   lines.append(' '.join([RANDOM_KEY, str(version), repr(gauss_next)] +
+      [str(n) for n in state]))
+
+   for (i, entity) in enumerate(entity_list):
+      if isinstance(entity, (entities.Miner, entities.Blacksmith)):
+         lines.append(' '.join([RESOURCES_KEY, str(i),
+            str(entity.get_resource_count())]))
+      animation = world.animations.get(entity)
+      if animation is not None:
+         lines.append(' '.join([ANIMATION_KEY, str(i), str(entity.current_img),
+            str(animation.start), str(animation.base),
+            str(animation.repeat_count), str(animation.shown)]))
+
+   for (entity, kind, due, seq) in world.scheduled_actions():
+      lines.append(' '.join([ACTION_KEY, str(indexes[entity]), kind,
+         str(due), str(seq)]))
+   lines.append(' '.join([SEQUENCE_KEY, str(world.action_queue.next_seq)]))
+   return lines
+
+
+def load_snapshot(world, i_store, file):
+   """Restore a snapshot into an empty world, leaving it exactly as it was
+   when saved."""
+   entity_list = []
+   for line in file:
+      properties = line.split()
+      if not properties:
+         continue
+      key = properties[0]
+      if key == save_load.BGND_KEY:
+         save_load.add_background(world, properties, i_store)
+      elif key == save_load.BGND_RUN_KEY:
+         save_load.add_background_run(world, properties, i_store)
+      elif key == TICKS_KEY:
+         world.ticks = int(properties[1])
+      elif key == RANDOM_KEY:
+         gauss_next = None if properties[2] == 'None' else float(properties[2])
+         random.setstate((int(properties[1]),
+            tuple(int(n) for n in properties[3:]), gauss_next))
+      elif key == RESOURCES_KEY:
+         entity_list[int(properties[1])].set_resource_count(
+            int(properties[2]))
+      elif key == ANIMATION_KEY:
+         entity = entity_list[int(properties[1])]
+         entity.current_img = int(properties[2])
+         world.animations.resume(entity, int(properties[3]),
+            int(properties[4]), int(properties[5]), int(properties[6]))
+      elif key == ACTION_KEY:
+         # snapshots from before sequence numbers were kept restore in
+         # file order, which is run order
+         seq = int(properties[4]) if len(properties) > 4 else None
+         world.restore_action(entity_list[int(properties[1])], properties[2],
+            int(properties[3]), i_store, seq)
+      elif key == SEQUENCE_KEY:
+         world.action_queue.next_seq = int(properties[1])
+      else:
+         entity = save_load.create_from_properties(properties, i_store)
+         if entity is None:
+            raise ValueError('bad snapshot record: ' + line.strip())
+         world.add_entity(entity)
+         entity_list.append(entity)
@@ -0,0 +1,137 @@
+import itertools
+
+BUCKET_SIZE = 8
+
+# below this many candidates a straight scan beats walking bucket rings
+LINEAR_SCAN_LIMIT = 32
+
+class SpatialIndex:
+   def __init__(self, bucket_size=BUCKET_SIZE):
+      self.bucket_size = bucket_size
+      self.types = {}
+      self.locations = {}
+      self.counter = itertools.count()
+
+
+   def bucket_of(self, pt):
+      return (pt.x // self.bucket_size, pt.y // self.bucket_size)
+
+
+   def add(self, entity):
+      key = self.bucket_of(entity.get_position())
+      seq = next(self.counter)
+      index = self.types.setdefault(type(entity), TypeIndex())
+      index.add(entity, key, seq)
+      self.locations[entity] = (index, key, seq)
+
+
+   def move(self, entity, pt):
+      location = self.locations.get(entity)
+      if location:
+         (index, key, seq) = location
+         new_key = self.bucket_of(pt)
+         if new_key != key:
+            index.remove(entity, key)
+            index.add(entity, new_key, seq)
+            self.locations[entity] = (index, new_key, seq)
+
+
+   def remove(self, entity):
+      location = self.locations.pop(entity, None)
+      if location:
+         (index, key, seq) = location
+         index.remove(entity, key)
+
+
+   def within(self, left, top, width, height):
+      """Entities inside the tile rectangle, in the order they were added."""
+      size = self.bucket_size
+      found = []
+      for index in self.types.values():
+         for by in range(top // size, (top + height - 1) // size + 1):
+            for bx in range(left // size, (left + width - 1) // size + 1):
+               bucket = index.buckets.get((bx, by))
+               if bucket:
+                  for (entity, seq) in bucket.items():
+                     pt = entity.get_position()
+                     if (left <= pt.x < left + width and
+                        top <= pt.y < top + height):
+                        found.append((seq, entity))
+
+      found.sort(key=lambda pair: pair[0])
+      return [entity for (seq, entity) in found]
+
+
+   def nearest(self, pt, type):
+      indexes = [index for (cls, index) in self.types.items()
+         if issubclass(cls, type) and index.count > 0]
+
+      if sum(index.count for index in indexes) <= LINEAR_SCAN_LIMIT:
+         best = None
+         for index in indexes:
+            for bucket in index.buckets.values():
+               best = closer(pt, bucket, best)
+      else:
+         best = self.nearest_in_rings(pt, indexes)
+
+      return best[2] if best else None
+
+
+   def nearest_in_rings(self, pt, indexes):
+      (bx, by) = self.bucket_of(pt)
+      limit = max(max(abs(kx - bx), abs(ky - by))
+         for index in indexes for (kx, ky) in index.buckets)
+
+      best = None
+      for r in range(0, limit + 1):
+         # any tile in ring r is at least this far away along one axis
+         gap = (r - 1) * self.bucket_size + 1
+         if best and r > 0 and best[0] < gap * gap:
+            break
+         for key in ring(bx, by, r):
+            for index in indexes:
+               bucket = index.buckets.get(key)
+               if bucket:
+                  best = closer(pt, bucket, best)
+
+      return best
+
+
+class TypeIndex:
+   def __init__(self):
+      self.buckets = {}
+      self.count = 0
+
+
+   def add(self, entity, key, seq):
+      self.buckets.setdefault(key, {})[entity] = seq
+      self.count += 1
+
+
+   def remove(self, entity, key):
+      bucket = self.buckets[key]
+      del bucket[entity]
+      if not bucket:
+         del self.buckets[key]
+      self.count -= 1
+
+
+def closer(pt, bucket, best):
+   for (entity, seq) in bucket.items():
+      e_pt = entity.get_position()
+      dist = (pt.x - e_pt.x)**2 + (pt.y - e_pt.y)**2
+      if best is None or (dist, seq) < (best[0], best[1]):
+         best = (dist, seq, entity)
+   return best
+
+
+def ring(cx, cy, r):
+   if r == 0:
+      yield (cx, cy)
+   else:
+      for x in range(cx - r, cx + r + 1):
+         yield (x, cy - r)
+         yield (x, cy + r)
+      for y in range(cy - r + 1, cy + r):
+         yield (cx - r, y)
+         yield (cx + r, y)
@@ -0,0 +1,64 @@
+import chunked_grid
+import point
+import shutil
+import tempfile
+import threading
+import unittest
+
+SIZE = 4
+
+
+class PagingInChunks(dict):
+   """Chunks that page key in on another thread while get_row is looking
+   it up, the interleaving a save thread can hit."""
+   def __init__(self, grid, key):
+      dict.__init__(self)
+      self.grid = grid
+      self.key = key
+      self.thread = None
+
+
+   def get(self, key, default=None):
+      chunk = dict.get(self, key, default)
+      if key == self.key and self.key in self.grid.paged_out:
+         self.key = None
+         self.thread = threading.Thread(target=self.grid.chunk,
+            args=(key,))
+         self.thread.start()
+         # a page in held back by the lock finishes after the lookup
+         self.thread.join(0.2)
+      return chunk
+
+
+class ChunkedGridTest(unittest.TestCase):
+   def setUp(self):
+      self.directory = tempfile.mkdtemp()
+      self.grid = chunked_grid.ChunkedGrid(SIZE * 2, SIZE, '-', SIZE)
+      self.grid.pager = chunked_grid.ChunkPager(self.directory, str,
+         lambda name, pt: name)
+
+
+   def tearDown(self):
+      shutil.rmtree(self.directory)
+
+
+   def test_get_row_reads_paged_chunks(self):
+      self.grid.fill_row(point.Point(0, 1), ['x'] * SIZE * 2)
+      self.grid.page_out(set([(1, 0)]))
+      self.assertEqual(list(self.grid.chunks), [(1, 0)])
+      self.assertEqual(self.grid.get_row(1), ['x'] * SIZE * 2)
+      self.assertEqual(self.grid.paged_out, set([(0, 0)]))
+
+
+   def test_get_row_during_page_in(self):
+      self.grid.fill_row(point.Point(0, 1), ['x'] * SIZE * 2)
+      self.grid.page_out(set())
+      chunks = PagingInChunks(self.grid, (0, 0))
+      self.grid.chunks = chunks
+      self.assertEqual(self.grid.get_row(1), ['x'] * SIZE * 2)
+      chunks.thread.join()
+      self.assertIn((0, 0), self.grid.chunks)
+
+
+if __name__ == '__main__':
+   unittest.main()
@@ -0,0 +1,65 @@
+import entities
+import entity_registry
+import headless
+import image_store
+import os
+import point
+import unittest
+import worldmodel
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def obstacle(name, x, y):
+   return entities.Obstacle(name, point.Point(x, y), [None])
+
+
+class EntityRegistryTest(unittest.TestCase):
+   def test_find_by_name(self):
+      registry = entity_registry.EntityRegistry()
+      rock = obstacle('rock', 0, 0)
+      stone = obstacle('stone', 1, 0)
+      registry.add(rock)
+      registry.add(stone)
+      self.assertIs(registry.find_by_name('rock'), rock)
+      self.assertIs(registry.find_by_name('stone'), stone)
+      self.assertIsNone(registry.find_by_name('pebble'))
+
+
+   def test_remove_keeps_names_in_step(self):
+      registry = entity_registry.EntityRegistry()
+      first = obstacle('rock', 0, 0)
+      second = obstacle('rock', 1, 0)
+      registry.add(first)
+      registry.add(second)
+      registry.remove(first)
+      self.assertIs(registry.find_by_name('rock'), second)
+      registry.remove(second)
+      self.assertIsNone(registry.find_by_name('rock'))
+      self.assertEqual(registry.by_name, {})
+
+
+   def test_readded_entity_is_found(self):
+      registry = entity_registry.EntityRegistry()
+      rock = obstacle('rock', 0, 0)
+      registry.add(rock)
+      order = registry.order(rock)
+      registry.remove(rock)
+      registry.add(rock, order)
+      self.assertIs(registry.find_by_name('rock'), rock)
+
+
+class FindEntityTest(unittest.TestCase):
+   def test_world_follows_removal(self):
+      i_store = image_store.load_placeholders(os.path.join(ROOT,
+         headless.IMAGE_LIST_FILE_NAME))
+      world = headless.create_world(5, 5, i_store)
+      rock = obstacle('rock', 2, 2)
+      world.add_entity(rock)
+      self.assertIs(world.find_entity('rock'), rock)
+      world.world_remove_entity(rock)
+      self.assertIsNone(world.find_entity('rock'))
+
+
+if __name__ == '__main__':
+   unittest.main()
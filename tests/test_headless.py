@@ -0,0 +1,26 @@
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# a fresh interpreter, so nothing imported by other tests is counted
+RUN_HEADLESS = '''
+import headless
+import sys
+sys.argv = ['headless.py', '--seed', '1', '--seconds', '5']
+headless.main()
+print('pygame.display' in sys.modules)
+'''
+
+
+class HeadlessTest(unittest.TestCase):
+   def test_runs_without_the_display(self):
+      output = subprocess.check_output([sys.executable, '-c', RUN_HEADLESS],
+         cwd=ROOT, universal_newlines=True)
+      self.assertEqual(output.split()[-1], 'False')
+
+
+if __name__ == '__main__':
+   unittest.main()
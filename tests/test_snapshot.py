@@ -0,0 +1,62 @@
+import headless
+import image_store
+import io
+import os
+import random
+import save_load
+import snapshot
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMAGE_LIST = os.path.join(ROOT, headless.IMAGE_LIST_FILE_NAME)
+WORLD_FILE = os.path.join(ROOT, headless.WORLD_FILE)
+
+
+def load_world(num_rows, num_cols, i_store):
+   world = headless.create_world(num_rows, num_cols, i_store)
+   with open(WORLD_FILE) as file:
+      save_load.load_world(world, i_store, file, True)
+   return world
+
+
+def snapshot_text(world):
+   file = io.StringIO()
+   snapshot.save_snapshot(world, file)
+   return file.getvalue()
+
+
+class SnapshotTest(unittest.TestCase):
+   def setUp(self):
+      random.seed(1)
+      self.i_store = image_store.load_placeholders(IMAGE_LIST)
+
+
+   def test_smaller_world(self):
+      # gaia is 40x30, so most of its actors fall outside this world
+      world = load_world(15, 20, self.i_store)
+      headless.run(world, 10)
+      text = snapshot_text(world)
+
+      restored = headless.create_world(15, 20, self.i_store)
+      snapshot.load_snapshot(restored, self.i_store, io.StringIO(text))
+      self.assertEqual(snapshot_text(restored), text)
+
+
+   def test_resumed_run_matches(self):
+      world = load_world(headless.WORLD_ROWS, headless.WORLD_COLS,
+         self.i_store)
+      headless.run(world, 10)
+      text = snapshot_text(world)
+      headless.run(world, 10)
+      expected = snapshot_text(world)
+
+      # loading puts back the random state the original run went on from
+      restored = headless.create_world(headless.WORLD_ROWS,
+         headless.WORLD_COLS, self.i_store)
+      snapshot.load_snapshot(restored, self.i_store, io.StringIO(text))
+      headless.run(restored, 10)
+      self.assertEqual(snapshot_text(restored), expected)
+
+
+if __name__ == '__main__':
+   unittest.main()
@@ -1,12 +1,21 @@
+import animation
+import chunked_grid
+import distance_field
 import entities
-import pygame
-import ordered_list
+import entity_registry
+import heapq
 import occ_grid
 import point
 import math
+import os
 import image_store
 import random
 import actions
+import batch_sim
+import pathfinding
+import scheduler
+import spatial_index
+import tempfile
 
 BLOB_RATE_SCALE = 4
 BLOB_ANIMATION_RATE_SCALE = 50
@@ -20,18 +29,172 @@ QUAKE_STEPS = 10
 QUAKE_DURATION = 1100
 QUAKE_ANIMATION_RATE = 100
 
+# chunks within this many tiles of the view or an actor stay in memory
+PAGE_MARGIN = 16
+# changed chunks written per page call, to keep each call short
+PAGE_WRITE_LIMIT = 4
+
+USE_DISTANCE_FIELDS = True
+MOBILE_TYPES = (entities.Miner, entities.OreBlob, entities.Quake)
+
+# what each scheduled action does, recorded so snapshots can rebuild it
+MINER_ACTION = 'miner'
+BLOB_ACTION = 'blob'
+VEIN_ACTION = 'vein'
+ORE_ACTION = 'ore'
+DEATH_ACTION = 'death'
+
 VEIN_SPAWN_DELAY = 500
 VEIN_RATE_MIN = 8000
 VEIN_RATE_MAX = 17000
 
 class WorldModel:
-   def __init__(self, num_rows, num_cols, background):
-      self.background = occ_grid.Grid(num_cols, num_rows, background)
+   def __init__(self, num_rows, num_cols, background, grid=occ_grid.Grid):
+      self.background = grid(num_cols, num_rows, background)
       self.num_rows = num_rows
       self.num_cols = num_cols
-      self.occupancy = occ_grid.Grid(num_cols, num_rows, None)
-      self.entities = []
-      self.action_queue = ordered_list.OrderedList()
+      self.occupancy = grid(num_cols, num_rows, None)
+      self.free_cells = occ_grid.FreeCellMap(num_cols, num_rows)
+      self.background_listeners = []
+      self.background_copies = []
+      self.action_queue = scheduler.Scheduler()
+      self.entities = entity_registry.EntityRegistry()
+      self.spatial_index = spatial_index.SpatialIndex()
+      self.batch = None
+      self.animations = animation.AnimationClock()
+      self.ticks = 0
+      self.actions_run = 0
+      self.paging_images = None
+      self.paging_directory = None
+      self.paged_backgrounds = {}
+      self.fields = {}
+      # with distance fields, the default, seek follows them for every
+      # target and only hands over once the target is adjacent, so A*
+      # routes are never planned and there is no route cache to keep
+      self.routes = None
+      if USE_DISTANCE_FIELDS:
+         self.add_distance_field(entities.Ore, MOBILE_TYPES)
+         self.add_distance_field(entities.Blacksmith, MOBILE_TYPES)
+         self.add_distance_field(entities.Vein,
+            MOBILE_TYPES + (entities.Ore,))
+      else:
+         self.routes = pathfinding.RouteCache()
+
+
+   def enable_batch(self, i_store):
+      """Run miners and blobs scheduled from now on through a
+      batch_sim.BatchEngine instead of the action queue."""
+      self.batch = batch_sim.BatchEngine(self, i_store)
+
+
+   def enable_paging(self, i_store, directory=None):
+      """Let background chunks, and occupancy chunks holding nothing but
+      obstacles, live on disk while they are away from the view and from
+      every actor.  The world must be built on chunked_grid.ChunkedGrid.
+      Without a directory the pages go in a temporary one, removed by
+      close_paging."""
+      if directory is None:
+         directory = tempfile.mkdtemp(prefix='world_pages_')
+         self.paging_directory = directory
+      self.paging_images = i_store
+      self.background.pager = chunked_grid.ChunkPager(
+         os.path.join(directory, 'background'), entities.Entity.get_name,
+         self.paged_background)
+      self.occupancy.pager = chunked_grid.ChunkPager(
+         os.path.join(directory, 'occupancy'), entities.Entity.get_name,
+         self.paged_obstacle, self.is_static_chunk, self.obstacles_paged_out,
+         self.obstacles_paged_in, self.entities.order)
+
+
+   def close_paging(self):
+      """Remove the page files.  Chunks still paged out are lost."""
+      if self.paging_images is None:
+         return
+      self.background.pager.close()
+      self.occupancy.pager.close()
+      if self.paging_directory is not None:
+         os.rmdir(self.paging_directory)
+         self.paging_directory = None
+      self.paging_images = None
+
+
+   def paged_background(self, name, pt):
+      bgnd = self.paged_backgrounds.get(name)
+      if bgnd is None:
+         bgnd = entities.Background(name,
+            image_store.get_images(self.paging_images, name))
+         self.paged_backgrounds[name] = bgnd
+      return bgnd
+
+
+   def paged_obstacle(self, name, pt):
+      return entities.Obstacle(name, pt,
+         image_store.get_images(self.paging_images, 'obstacle'))
+
+
+   def is_static_chunk(self, chunk):
+      static = set([type(None), entities.Obstacle])
+      return all(set(map(type, row)) <= static for row in chunk)
+
+
+   def obstacles_paged_out(self, chunk):
+      for row in chunk:
+         for obstacle in row:
+            if obstacle is not None:
+               self.entities.remove(obstacle)
+               self.spatial_index.remove(obstacle)
+
+
+   def obstacles_paged_in(self, chunk, orders):
+      obstacles = [obstacle for row in chunk for obstacle in row
+         if obstacle is not None]
+      for (obstacle, order) in zip(obstacles, orders):
+         self.entities.add(obstacle, order)
+         self.spatial_index.add(obstacle)
+
+
+   def page(self, left, top, width, height):
+      """Page out the chunks more than PAGE_MARGIN tiles away from the tile
+      rectangle and from every actor, writing at most PAGE_WRITE_LIMIT
+      changed chunks.  Returns how many were left for the next call."""
+      if self.paging_images is None:
+         return 0
+      size = self.occupancy.chunk_size
+      keep = chunked_grid.chunks_in(left - PAGE_MARGIN, top - PAGE_MARGIN,
+         left + width - 1 + PAGE_MARGIN, top + height - 1 + PAGE_MARGIN, size)
+      for entity in self.entities.not_of_type(entities.Obstacle):
+         pt = entity.get_position()
+         keep.update(chunked_grid.chunks_in(pt.x - PAGE_MARGIN,
+            pt.y - PAGE_MARGIN, pt.x + PAGE_MARGIN, pt.y + PAGE_MARGIN,
+            size))
+      waiting = self.background.page_out(keep, PAGE_WRITE_LIMIT)
+      return waiting + self.occupancy.page_out(keep, PAGE_WRITE_LIMIT)
+
+
+   def saved_entities(self):
+      """(entity, save record) for every entity in the order they were
+      added, with None for the obstacles paged out to disk."""
+      if self.paging_images is None or not self.occupancy.paged_out:
+         return [(entity, entity.self_string()) for entity in self.entities]
+
+      live = ((self.entities.order(entity), entity.self_string(), entity)
+         for entity in self.entities)
+      size = self.occupancy.chunk_size
+      paged = sorted((order,
+         entities.Obstacle(name, pt, None).self_string(), None)
+         for key in self.occupancy.paged_out
+         for (name, pt, order) in self.occupancy.pager.names(key, size))
+      return [(entity, record) for (order, record, entity)
+         in heapq.merge(live, paged, key=lambda item: item[0])]
+
+
+   def entity_records(self):
+      return [record for (entity, record) in self.saved_entities()]
+
+
+   def add_distance_field(self, target, open_types):
+      self.fields[target] = distance_field.DistanceField(
+         self.num_cols, self.num_rows, target, open_types)
 
 
    def within_bounds(self, pt):
@@ -62,10 +225,7 @@ class WorldModel:
 
 
    def find_nearest(self, pt, type):
-      oftype = [(e, self.distance_sq(pt, e.get_position()))
-         for e in self.entities if isinstance(e, type)]
-
-      return self.nearest_entity(oftype)
+      return self.spatial_index.nearest(pt, type)
 
 
    def add_entity(self, entity):
@@ -73,19 +233,23 @@ class WorldModel:
       if self.within_bounds(pt):
          old_entity = self.occupancy.get_cell(pt)
          if old_entity != None:
-            entities.clear_pending_actions(old_entity)
-         self.occupancy.set_cell(pt, entity)
-         self.entities.append(entity)
+            self.clear_pending_actions(old_entity)
+         self.set_occupant(pt, entity)
+         self.entities.add(entity)
+         self.spatial_index.add(entity)
 
 
    def move_entity(self, entity, pt):
       tiles = []
       if self.within_bounds(pt):
          old_pt = entity.get_position()
-         self.occupancy.set_cell(old_pt, None)
+         if self.routes is not None:
+            self.routes.advance(entity, pt)
+         self.set_occupant(old_pt, None)
          tiles.append(old_pt)
-         self.occupancy.set_cell(pt, entity)
+         self.set_occupant(pt, entity)
          tiles.append(pt)
+         self.spatial_index.move(entity, pt)
          entity.set_position(pt)
 
       return tiles
@@ -101,29 +265,84 @@ class WorldModel:
          entity = self.occupancy.get_cell(pt)
          entity.set_position(point.Point(-1, -1))
          self.entities.remove(entity)
-         self.occupancy.set_cell(pt, None)
+         self.spatial_index.remove(entity)
+         if self.routes is not None:
+            self.routes.forget(entity)
+         self.animations.stop(entity, self.ticks)
+         if self.batch is not None:
+            self.batch.remove(entity)
+         self.set_occupant(pt, None)
+
 
+   def set_occupant(self, pt, entity):
+      self.occupancy.set_cell(pt, entity)
+      self.free_cells.set_free(pt, entity is None)
+      if self.routes is not None:
+         self.routes.invalidate(pt)
+      for field in self.fields.values():
+         field.update(pt, entity)
 
-   def world_schedule_action(self, action, time):
-      self.action_queue.insert(action, time)
 
+   def world_schedule_action(self, action, time, entity=None, kind=None,
+      seq=None):
+      return self.action_queue.insert(action, time, entity, kind, seq)
 
-   def unschedule_action(self, action):
-      self.action_queue.remove(action)
+
+   def unschedule_action(self, handle):
+      self.action_queue.cancel(handle)
 
 
    def update_on_time(self, ticks):
+      self.ticks = ticks
       tiles = []
 
-      next = self.action_queue.head()
-      while next and next.ord < ticks:
-         self.action_queue.pop()
-         tiles.extend(next.item(ticks))  # invoke action function // hey, more comments than this next time, please
+      batch = self.batch
+      if batch is not None:
+         batch.start_tick(ticks)
+
+      # queue actions and batch actors run in one order, by due time then
+      # by when they were scheduled
+      while True:
          next = self.action_queue.head()
+         if next and next.ord >= ticks:
+            next = None
+         if batch is not None and batch.runs_before(next):
+            tiles.extend(batch.run_next(ticks))
+         elif next:
+            self.action_queue.pop()
+            if next.owner:
+               next.owner.remove_pending_action(next)
+            self.actions_run += 1
+            tiles.extend(next.item(ticks))  # invoke action function // hey, more comments than this next time, please
+         else:
+            break
 
       return tiles
 
 
+   def next_due_time(self, ticks, left, top, width, height):
+      """The earliest time at which an action or batch actor is due, or
+      an animated entity inside the tile rectangle changes frame."""
+      times = []
+      head = self.action_queue.head()
+      if head:
+         times.append(head.ord)
+      if self.batch is not None and len(self.batch):
+         times.append(self.batch.next_due_time())
+      frame_time = self.animations.next_frame_time(
+         self.entities_in_rect(left, top, width, height), ticks)
+      if frame_time is not None:
+         times.append(frame_time)
+      return min(times) if times else None
+
+
+   def update_animations(self, ticks, left, top, width, height):
+      """Move the animated entities inside the tile rectangle to their
+      frame at ticks, returning the tiles that need redrawing."""
+      return self.animations.sync(
+         self.entities_in_rect(left, top, width, height), ticks)
+
+
    def get_background_image(self, pt):
       if self.within_bounds(pt):
          return self.background.get_cell(pt).get_image()
@@ -134,9 +353,39 @@ class WorldModel:
          return self.background.get_cell(pt)
 
 
+   def get_background_row(self, row):
+      return self.background.get_row(row)
+
+
    def set_background(self, pt, bgnd):
       if self.within_bounds(pt):
+         self.keep_background_row(pt.y)
          self.background.set_cell(pt, bgnd)
+         for listener in self.background_listeners:
+            listener(pt)
+
+
+   def set_background_run(self, pt, bgnds):
+      """Set the backgrounds of the tiles from pt rightwards."""
+      if self.within_bounds(pt):
+         bgnds = bgnds[:self.num_cols - pt.x]
+         self.keep_background_row(pt.y)
+         self.background.fill_row(pt, bgnds)
+         for listener in self.background_listeners:
+            listener(pt, len(bgnds))
+
+
+   def keep_background_row(self, row):
+      """Let copies still reading the background keep row as it is before
+      it changes."""
+      for copy in self.background_copies:
+         copy.keep_row(row)
+
+
+   def add_background_listener(self, listener):
+      """listener(pt, length=1) is told of each run of tiles from pt
+      rightwards whose background is set."""
+      self.background_listeners.append(listener)
 
 
    def get_tile_occupant(self, pt):
@@ -147,6 +396,21 @@ class WorldModel:
    def get_entities(self):
       return self.entities
 
+
+   def entities_in_rect(self, left, top, width, height):
+      return self.spatial_index.within(left, top, width, height)
+
+
+   def get_entities_of_type(self, type):
+      return self.entities.of_type(type)
+
+
+   def find_entity(self, name):
+      """The entity called name, or None; obstacles paged out to disk are
+      not found until they are paged back in."""
+      return self.entities.find_by_name(name)
+
+
    def next_position(self, entity_pt, dest_pt):
       horiz = actions.sign(dest_pt.x - entity_pt.x)
       new_pt = point.Point(entity_pt.x + horiz, entity_pt.y)
@@ -179,6 +443,64 @@ class WorldModel:
       return new_pt
 
 
+   def is_open(self, pt):
+      return self.within_bounds(pt) and not self.is_occupied(pt)
+
+
+   def is_open_for_blob(self, pt):
+      return self.within_bounds(pt) and (not self.is_occupied(pt) or
+         isinstance(self.get_tile_occupant(pt), entities.Ore))
+
+
+   def route_next_position(self, entity, dest_pt, is_open, fallback):
+      entity_pt = entity.get_position()
+      if self.routes is None:
+         path = pathfinding.find_path(entity_pt, dest_pt, is_open)
+         if not path:
+            return fallback(entity_pt, dest_pt)
+         return point.Point(path[0][0], path[0][1])
+
+      new_pt = self.routes.next_step(entity, dest_pt)
+      if new_pt is None:
+         path = pathfinding.find_path(entity_pt, dest_pt, is_open)
+         if not path:
+            self.routes.forget(entity)
+            return fallback(entity_pt, dest_pt)
+         self.routes.store(entity, dest_pt, path)
+         new_pt = self.routes.next_step(entity, dest_pt)
+
+      return new_pt
+
+
+   def find_adjacent(self, pt, type):
+      for (dx, dy) in distance_field.NEIGHBORS:
+         occupant = self.get_tile_occupant(point.Point(pt.x + dx, pt.y + dy))
+         if isinstance(occupant, type):
+            return occupant
+
+      return None
+
+
+   def seek(self, entity, type, to_target, is_open, move):
+      entity_pt = entity.get_position()
+      field = self.fields.get(type)
+      if field is None:
+         return to_target(entity, self.find_nearest(entity_pt, type))
+
+      # entities loaded outside a smaller world have no field to follow
+      if not self.within_bounds(entity_pt):
+         return ([entity_pt], False)
+
+      target = self.find_adjacent(entity_pt, type)
+      if target:
+         return to_target(entity, target)
+
+      new_pt = field.downhill(entity_pt, is_open)
+      if new_pt is None:
+         return ([entity_pt], False)
+      return (move(entity, new_pt), False)
+
+
    def miner_to_ore(self, entity, ore):
       entity_pt = entity.get_position()
       if not ore:
@@ -187,10 +509,11 @@ class WorldModel:
       if actions.adjacent(entity_pt, ore_pt):
          entity.set_resource_count(
             1 + entity.get_resource_count())
-         self.world_remove_entity(ore)
+         self.remove_entity(ore)
          return ([ore_pt], True)
       else:
-         new_pt = self.next_position(entity_pt, ore_pt)
+         new_pt = self.route_next_position(entity, ore_pt,
+            self.is_open, self.next_position)
          return (self.move_entity(entity, new_pt), False)
 
 
@@ -206,17 +529,15 @@ class WorldModel:
          entity.set_resource_count(0)
          return ([], True)
       else:
-         new_pt = self.next_position( entity_pt, smith_pt)
+         new_pt = self.route_next_position( entity, smith_pt,
+            self.is_open, self.next_position)
          return (self.move_entity( entity, new_pt), False)
 
 
    def create_miner_not_full_action(self, entity, i_store):
       def action(current_ticks):
-         entity.remove_pending_action(action)
-
-         entity_pt = entity.get_position()
-         ore = self.find_nearest( entity_pt, entities.Ore)
-         (tiles, found) = self.miner_to_ore( entity, ore)
+         (tiles, found) = self.seek( entity, entities.Ore,
+            self.miner_to_ore, self.is_open, self.move_entity)
 
          new_entity = entity
          if found:
@@ -225,18 +546,15 @@ class WorldModel:
 
          self.schedule_action( new_entity,
             self.create_miner_action( new_entity, i_store),
-            current_ticks + new_entity.get_rate())
+            current_ticks + new_entity.get_rate(), MINER_ACTION)
          return tiles
       return action
 
 
    def create_miner_full_action(self, entity, i_store):
       def action(current_ticks):
-         entity.remove_pending_action(action)
-
-         entity_pt = entity.get_position()
-         smith = self.find_nearest( entity_pt, entities.Blacksmith)
-         (tiles, found) = self.miner_to_smith( entity, smith)
+         (tiles, found) = self.seek( entity, entities.Blacksmith,
+            self.miner_to_smith, self.is_open, self.move_entity)
 
          new_entity = entity
          if found:
@@ -245,7 +563,7 @@ class WorldModel:
 
          self.schedule_action( new_entity,
             self.create_miner_action( new_entity, i_store),
-            current_ticks + new_entity.get_rate())
+            current_ticks + new_entity.get_rate(), MINER_ACTION)
          return tiles
       return action
 
@@ -256,23 +574,25 @@ class WorldModel:
          return ([entity_pt], False)
       vein_pt = vein.get_position()
       if actions.adjacent(entity_pt, vein_pt):
-         self.world_remove_entity( vein)
+         self.remove_entity( vein)
          return ([vein_pt], True)
       else:
-         new_pt = self.blob_next_position( entity_pt, vein_pt)
-         old_entity = self.get_tile_occupant( new_pt)
-         if isinstance(old_entity, entities.Ore):
-            self.remove_entity( old_entity)
-         return (self.move_entity( entity, new_pt), False)
+         new_pt = self.route_next_position( entity, vein_pt,
+            self.is_open_for_blob, self.blob_next_position)
+         return (self.move_blob( entity, new_pt), False)
+
+
+   def move_blob(self, entity, new_pt):
+      old_entity = self.get_tile_occupant( new_pt)
+      if isinstance(old_entity, entities.Ore):
+         self.remove_entity( old_entity)
+      return self.move_entity( entity, new_pt)
 
 
    def create_ore_blob_action(self, entity, i_store):
       def action(current_ticks):
-         entity.remove_pending_action(action)
-
-         entity_pt = entity.get_position()
-         vein = self.find_nearest( entity_pt, entities.Vein)
-         (tiles, found) = self.blob_to_vein( entity, vein)
+         (tiles, found) = self.seek( entity, entities.Vein,
+            self.blob_to_vein, self.is_open_for_blob, self.move_blob)
 
          next_time = current_ticks + entity.get_rate()
          if found:
@@ -282,33 +602,24 @@ class WorldModel:
 
          self.schedule_action( entity,
             self.create_ore_blob_action( entity, i_store),
-            next_time)
+            next_time, BLOB_ACTION)
 
          return tiles
       return action
 
 
    def find_open_around(self, pt, distance):
-      for dy in range(-distance, distance + 1):
-         for dx in range(-distance, distance + 1):
-            new_pt = point.Point(pt.x + dx, pt.y + dy)
-
-            if (self.within_bounds( new_pt) and
-               (not self.is_occupied( new_pt))):
-               return new_pt
-
-      return None
+      return self.free_cells.first_free(pt.x - distance, pt.y - distance,
+         pt.x + distance, pt.y + distance)
 
 
    def create_vein_action(self, entity, i_store):
       def action(current_ticks):
-         entity.remove_pending_action(action)
-
          open_pt = self.find_open_around( entity.get_position(),
             entity.get_resource_distance())
          if open_pt:
             ore = self.create_ore(
-               "ore - " + entity.get_name() + " - " + str(current_ticks),
+               "ore_" + entity.get_name() + "_" + str(current_ticks),
                open_pt, current_ticks, i_store)
             self.add_entity( ore)
             tiles = [open_pt]
@@ -317,7 +628,7 @@ class WorldModel:
 
          self.schedule_action( entity,
             self.create_vein_action( entity, i_store),
-            current_ticks + entity.get_rate())
+            current_ticks + entity.get_rate(), VEIN_ACTION)
          return tiles
       return action
 
@@ -360,24 +671,8 @@ class WorldModel:
          return self.create_miner_full_action( entity, image_store)
 
 
-   def create_animation_action(self, entity, repeat_count):
-      def action(current_ticks):
-         entity.remove_pending_action(action)
-
-         entity.next_image()
-
-         if repeat_count != 1:
-            self.schedule_action( entity,
-               self.create_animation_action( entity, max(repeat_count - 1, 0)),
-               current_ticks + entity.get_animation_rate())
-
-         return [entity.get_position()]
-      return action
-
-
    def create_entity_death_action(self, entity):
       def action(current_ticks):
-         entity.remove_pending_action(action)
          pt = entity.get_position()
          self.remove_entity( entity)
          return [pt]
@@ -386,8 +681,7 @@ class WorldModel:
 
    def create_ore_transform_action(self, entity, i_store):
       def action(current_ticks):
-         entity.remove_pending_action(action)
-         blob = self.create_blob( entity.get_name() + " -- blob",
+         blob = self.create_blob( entity.get_name() + "_blob",
             entity.get_position(),
             entity.get_rate() // BLOB_RATE_SCALE,
             current_ticks, i_store)
@@ -400,9 +694,7 @@ class WorldModel:
 
 
    def remove_entity(self, entity):
-      for action in entity.get_pending_actions():
-         self.unschedule_action( action)
-      entity.clear_pending_actions()
+      self.clear_pending_actions( entity)
       self.world_remove_entity( entity)
 
 
@@ -416,14 +708,22 @@ class WorldModel:
 
 
    def schedule_blob(self, blob, ticks, i_store):
-      self.schedule_action( blob, self.create_ore_blob_action( blob, i_store),
-         ticks + blob.get_rate())
+      if self.batch is not None:
+         self.batch.add( blob, ticks + blob.get_rate())
+      else:
+         self.schedule_action( blob,
+            self.create_ore_blob_action( blob, i_store),
+            ticks + blob.get_rate(), BLOB_ACTION)
       self.schedule_animation( blob)
 
 
    def schedule_miner(self, miner, ticks, i_store):
-      self.schedule_action( miner, self.create_miner_action( miner, i_store),
-         ticks + miner.get_rate())
+      if self.batch is not None:
+         self.batch.add( miner, ticks + miner.get_rate())
+      else:
+         self.schedule_action( miner,
+            self.create_miner_action( miner, i_store),
+            ticks + miner.get_rate(), MINER_ACTION)
       self.schedule_animation( miner)
 
 
@@ -438,7 +738,7 @@ class WorldModel:
    def schedule_ore(self, ore, ticks, i_store):
       self.schedule_action( ore,
          self.create_ore_transform_action( ore, i_store),
-         ticks + ore.get_rate())
+         ticks + ore.get_rate(), ORE_ACTION)
 
 
    def create_quake(self, pt, ticks, i_store):
@@ -451,7 +751,7 @@ class WorldModel:
    def schedule_quake(self, quake, ticks):
       self.schedule_animation( quake, QUAKE_STEPS) 
       self.schedule_action( quake, self.create_entity_death_action( quake),
-         ticks + QUAKE_DURATION)
+         ticks + QUAKE_DURATION, DEATH_ACTION)
 
 
    def create_vein(self, name, pt, ticks, i_store):
@@ -463,21 +763,57 @@ class WorldModel:
 
    def schedule_vein(self, vein, ticks, i_store):
       self.schedule_action( vein, self.create_vein_action( vein, i_store),
-         ticks + vein.get_rate())
-
-
-   def schedule_action(self, entity, action, time):
-      entity.add_pending_action(action)
-      self.world_schedule_action(action, time)
+         ticks + vein.get_rate(), VEIN_ACTION)
+
+
+   def schedule_action(self, entity, action, time, kind=None, seq=None):
+      handle = self.world_schedule_action(action, time, entity, kind, seq)
+      entity.add_pending_action(handle)
+      return handle
+
+
+   def create_action(self, kind, entity, i_store):
+      if kind == MINER_ACTION:
+         return self.create_miner_action( entity, i_store)
+      elif kind == BLOB_ACTION:
+         return self.create_ore_blob_action( entity, i_store)
+      elif kind == VEIN_ACTION:
+         return self.create_vein_action( entity, i_store)
+      elif kind == ORE_ACTION:
+         return self.create_ore_transform_action( entity, i_store)
+      elif kind == DEATH_ACTION:
+         return self.create_entity_death_action( entity)
+      raise ValueError('unknown action kind %r' % kind)
+
+
+   def scheduled_actions(self):
+      """(entity, kind, due time, sequence number) for each pending action,
+      including the batch engine's actors, in the order they will run."""
+      actions = [(entry.owner, entry.kind, entry.ord, entry.seq)
+         for entry in self.action_queue.entries()]
+      if self.batch is not None:
+         for (entity, due, seq) in self.batch.scheduled():
+            kind = BLOB_ACTION if isinstance(entity, entities.OreBlob) \
+               else MINER_ACTION
+            actions.append((entity, kind, due, seq))
+         actions.sort(key=lambda action: action[2:])
+      return actions
+
+
+   def restore_action(self, entity, kind, due, i_store, seq=None):
+      if self.batch is not None and kind in (MINER_ACTION, BLOB_ACTION):
+         self.batch.add( entity, due, seq)
+      else:
+         self.schedule_action( entity,
+            self.create_action( kind, entity, i_store), due, kind, seq)
 
 
    def schedule_animation(self, entity, repeat_count=0):
-      self.schedule_action( entity,
-         self.create_animation_action( entity, repeat_count),
-         entity.get_animation_rate())
+      self.animations.start( entity, self.ticks, repeat_count)
 
 
    def clear_pending_actions(self, entity):
-      for action in entity.get_pending_actions():
-         self.unschedule_action( action)
+      for handle in entity.get_pending_actions():
+         self.unschedule_action( handle)
       entity.clear_pending_actions()
+      self.animations.stop( entity, self.ticks)
@@ -1,3 +1,5 @@
+import collections
+import dirty_region
 import pygame
 import worldmodel
 import entities
@@ -7,9 +9,16 @@ MOUSE_HOVER_ALPHA = 120
 MOUSE_HOVER_EMPTY_COLOR = (0, 255, 0)
 MOUSE_HOVER_OCC_COLOR = (255, 0, 0)
 
+TILE_CACHE_SIZE = 512
+BACKGROUND_CHUNK_SIZE = 16
+# chunk surfaces kept, least recently drawn first out; never fewer than a
+# view can show at once
+BACKGROUND_CHUNK_CACHE_SIZE = 24
+
 class WorldView:
    def __init__(self, view_cols, view_rows, screen, world, tile_width,
-      tile_height, mouse_img=None):
+      tile_height, mouse_img=None,
+      full_update_threshold=dirty_region.FULL_UPDATE_THRESHOLD):
       self.viewport = pygame.Rect(0, 0, view_cols, view_rows)
       self.screen = screen
       self.mouse_pt = point.Point(0, 0)
@@ -19,6 +28,14 @@ class WorldView:
       self.num_rows = world.num_rows
       self.num_cols = world.num_cols
       self.mouse_img = mouse_img
+      self.tile_cache = TileCache(TILE_CACHE_SIZE)
+      self.background_chunks = collections.OrderedDict()
+      self.background_chunk_limit = max(BACKGROUND_CHUNK_CACHE_SIZE,
+         (view_cols // BACKGROUND_CHUNK_SIZE + 2) *
+         (view_rows // BACKGROUND_CHUNK_SIZE + 2))
+      self.dirty = dirty_region.DirtyRegion(tile_width, tile_height,
+         full_update_threshold)
+      world.add_background_listener(self.background_changed)
 
 
    def viewport_to_world(self, pt):
@@ -41,19 +58,58 @@ class WorldView:
 
 
    def draw_background(self):
-      for y in range(0, self.viewport.height):
-         for x in range(0, self.viewport.width):
-            w_pt = self.viewport_to_world(point.Point(x, y))
-            img = self.world.get_background_image(w_pt)
-            self.screen.blit(img, (x * self.tile_width, y * self.tile_height))
+      size = BACKGROUND_CHUNK_SIZE
+      for cy in range(self.viewport.top // size,
+         (self.viewport.bottom - 1) // size + 1):
+         for cx in range(self.viewport.left // size,
+            (self.viewport.right - 1) // size + 1):
+            self.screen.blit(self.get_background_chunk(cx, cy),
+               ((cx * size - self.viewport.left) * self.tile_width,
+               (cy * size - self.viewport.top) * self.tile_height))
+
+
+   def get_background_chunk(self, cx, cy):
+      chunk = self.background_chunks.get((cx, cy))
+      if chunk is not None:
+         self.background_chunks.move_to_end((cx, cy))
+      else:
+         size = BACKGROUND_CHUNK_SIZE
+         chunk = pygame.Surface((size * self.tile_width,
+            size * self.tile_height))
+         for y in range(cy * size, min((cy + 1) * size, self.num_rows)):
+            for x in range(cx * size, min((cx + 1) * size, self.num_cols)):
+               self.blit_background_tile(chunk, point.Point(x, y))
+         self.background_chunks[(cx, cy)] = chunk
+         if len(self.background_chunks) > self.background_chunk_limit:
+            self.background_chunks.popitem(last=False)
+      return chunk
+
+
+   def blit_background_tile(self, chunk, pt):
+      size = BACKGROUND_CHUNK_SIZE
+      chunk.blit(self.world.get_background_image(pt),
+         ((pt.x % size) * self.tile_width, (pt.y % size) * self.tile_height))
+
+
+   def background_changed(self, pt, length=1):
+      size = BACKGROUND_CHUNK_SIZE
+      for cx in range(pt.x // size, (pt.x + length - 1) // size + 1):
+         chunk = self.background_chunks.get((cx, pt.y // size))
+         if chunk is not None:
+            for x in range(max(pt.x, cx * size),
+               min(pt.x + length, (cx + 1) * size)):
+               self.blit_background_tile(chunk, point.Point(x, pt.y))
 
 
    def draw_entities(self):
-      for entity in self.world.entities:
-         if self.viewport.collidepoint(entity.position.x, entity.position.y):
-            v_pt = self.world_to_viewport(entity.position)
-            self.screen.blit(entity.get_image(),
-               (v_pt.x * self.tile_width, v_pt.y * self.tile_height))
+      visible = self.world.entities_in_rect(self.viewport.left,
+         self.viewport.top, self.viewport.width, self.viewport.height)
+      # entities scrolled into view may be showing a stale frame
+      self.world.animations.sync(visible, self.world.ticks)
+      for entity in visible:
+         v_pt = self.world_to_viewport(entity.get_position())
+         self.screen.blit(entity.get_image(),
+            (v_pt.x * self.tile_width, v_pt.y * self.tile_height))
 
 
    def draw_viewport(self):
@@ -71,16 +127,15 @@ class WorldView:
 
 
    def update_view_tiles(self, tiles):
-      rects = []
-      for tile in tiles:
-         if self.viewport.collidepoint(tile.x, tile.y):
-            v_pt = self.world_to_viewport(tile)
-            img = self.get_tile_image(v_pt)
-            rects.append(self.update_tile(v_pt, img))
+      for (x, y) in set((tile.x, tile.y) for tile in tiles):
+         if self.viewport.collidepoint(x, y):
+            v_pt = self.world_to_viewport(point.Point(x, y))
+            self.update_tile(v_pt, self.get_tile_image(v_pt))
+            self.dirty.add(v_pt)
             if self.mouse_pt.x == v_pt.x and self.mouse_pt.y == v_pt.y:
-               rects.append(self.update_mouse_cursor())
+               self.update_mouse_cursor()
 
-      pygame.display.update(rects)
+      self.dirty.flush()
 
 
    def update_tile(self, view_tile_pt, surface):
@@ -97,10 +152,8 @@ class WorldView:
       bgnd = self.world.get_background_image(pt)
       occupant = self.world.get_tile_occupant(pt)
       if occupant:
-         img = pygame.Surface((self.tile_width, self.tile_height))
-         img.blit(bgnd, (0, 0))
-         img.blit(occupant.get_image(), (0,0))
-         return img
+         return self.tile_cache.get(bgnd, occupant.get_image(),
+            self.tile_width, self.tile_height)
       else:
          return bgnd
 
@@ -139,3 +192,36 @@ class WorldView:
 
       pygame.display.update(rects)
 
+
+def format_stats(view):
+   cache = view.tile_cache
+   lookups = cache.hits + cache.misses
+   return ('tile cache: %d lookups, %.1f%% hits, %d tiles composited' %
+      (lookups, cache.hits * 100.0 / max(lookups, 1), cache.misses))
+
+
+class TileCache:
+   """Least recently used cache of tiles composited from a background
+   image and an occupant image, keyed by the two surfaces."""
+   def __init__(self, size):
+      self.size = size
+      self.tiles = collections.OrderedDict()
+      self.hits = 0
+      self.misses = 0
+
+
+   def get(self, bgnd, img, tile_width, tile_height):
+      key = (bgnd, img)
+      tile = self.tiles.get(key)
+      if tile is not None:
+         self.hits += 1
+         self.tiles.move_to_end(key)
+      else:
+         self.misses += 1
+         tile = pygame.Surface((tile_width, tile_height))
+         tile.blit(bgnd, (0, 0))
+         tile.blit(img, (0, 0))
+         self.tiles[key] = tile
+         if len(self.tiles) > self.size:
+            self.tiles.popitem(last=False)
+      return tile